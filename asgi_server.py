@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Async (ASGI) ML Server
+- Same JSON routes as ml_server.py (/health, /status, /predict_all, /predict,
+  /stats, /train) on one Starlette event loop, so thousands of polling clients
+  don't need thousands of threads
+- MySQL reads go through an aiomysql pool: waiting on the database holds no thread
+- CPU work (fleet computation, JSON encoding of large results) runs in a thread pool
+- Shares ml_server's MaintenancePredictor, queries, prediction cache, snapshots
+  and training jobs; concurrent identical requests await one in-flight computation
+
+Run:
+  uvicorn asgi_server:app --host 0.0.0.0 --port 8080
+  python asgi_server.py
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from datetime import datetime
+
+import aiomysql
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import change_tracking
+import fleet_engine
+import maintenance_calendar
+import ml_server
+import prediction_stream
+import response_formats
+from maintenance_schedule import REGISTRY as schedule_registry
+from ml_server import (BATCH_QUERY_IDS, FINGERPRINT_QUERY, FLEET_QUERY, FLEET_QUERY_TEMPLATE, INFERENCE_ONLY,
+                       SNAPSHOT_WAIT_TIMEOUT, VEHICLE_IDS_QUERY, VEHICLE_QUERY, VEHICLES_QUERY,
+                       predictor, training_jobs)
+from prediction_filters import URGENCY_SCAN_BATCH, FilterError, PredictionFilters
+from single_flight import AsyncSingleFlight
+from training_jobs import job_result
+from urgency_events import (EVENTS_HEARTBEAT, EVENTS_RETRY_AFTER, HEARTBEAT, STREAM_PREAMBLE, AsyncSubscription,
+                            TooManySubscribers)
+
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 10))
+ASGI_CPU_WORKERS = int(os.getenv('ASGI_CPU_WORKERS', os.cpu_count() or 2))
+# Streams cost no thread here, so the cap is far above the Flask one (0: no limit)
+ASGI_EVENTS_MAX_SUBSCRIBERS = int(os.getenv('ASGI_EVENTS_MAX_SUBSCRIBERS', 10000))
+
+# Fleet computation and JSON encoding of large payloads (keeps the event loop free)
+cpu_executor = ThreadPoolExecutor(max_workers=ASGI_CPU_WORKERS, thread_name_prefix='asgi-cpu')
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, fn, *args)
+
+
+async def run_blocking(fn, *args):
+    """Blocking waits (events, file reads) on the loop's default executor, not the CPU pool"""
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def dumps(content):
+    return response_formats.dumps_json(content)
+
+
+def json_response(content, status_code=200):
+    return Response(dumps(content), status_code=status_code, media_type='application/json')
+
+
+class AsyncDatabase:
+    """aiomysql pool with the same settings as ml_server.get_db_connection"""
+
+    def __init__(self, size=None, wait_timeout=None, max_lifetime=None):
+        self.size = size or ASYNC_DB_POOL_SIZE
+        self.wait_timeout = wait_timeout if wait_timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 10))
+        self.max_lifetime = max_lifetime if max_lifetime is not None else int(os.getenv('DB_POOL_RECYCLE', 1800))
+        self.pool = None
+
+    async def start(self):
+        config = ml_server.get_db_config()
+        # minsize=0: the server starts (and /health answers) even if MySQL is down
+        self.pool = await aiomysql.create_pool(
+            host=config['host'],
+            user=config['user'],
+            password=config['password'],
+            db=config['database'],
+            charset=config['charset'],
+            autocommit=config['autocommit'],
+            connect_timeout=config['connect_timeout'],
+            minsize=0,
+            maxsize=self.size,
+            pool_recycle=self.max_lifetime,
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+    async def _execute(self, query, args, fetch, dictionary):
+        conn = await asyncio.wait_for(self.pool.acquire(), self.wait_timeout)
+        try:
+            async with conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cursor:
+                await cursor.execute(query, args)
+                return await (cursor.fetchall() if fetch == 'all' else cursor.fetchone())
+        except BaseException:
+            # Don't hand a connection with an unfinished result back to the pool
+            conn.close()
+            raise
+        finally:
+            self.pool.release(conn)
+
+    async def fetchall(self, query, args=None, dictionary=True):
+        return await self._execute(query, args, 'all', dictionary)
+
+    async def fetchone(self, query, args=None, dictionary=True):
+        return await self._execute(query, args, 'one', dictionary)
+
+    async def ping(self):
+        return await self.fetchone('SELECT 1', dictionary=False)
+
+    async def stream(self, query, args=None, batch_size=prediction_stream.STREAM_BATCH_SIZE):
+        """Row batches from an unbuffered (server-side) cursor; holds a connection until exhausted"""
+        conn = await asyncio.wait_for(self.pool.acquire(), self.wait_timeout)
+        try:
+            cursor = await conn.cursor(aiomysql.SSDictCursor)
+            await cursor.execute(query, args)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+            await cursor.close()
+        except BaseException:
+            # Abandoned or failed stream: unread rows are still on the connection
+            conn.close()
+            raise
+        finally:
+            self.pool.release(conn)
+
+    def stats(self):
+        if self.pool is None:
+            return {'size': self.size, 'open': 0, 'idle': 0, 'in_use': 0}
+        return {
+            'size': self.size,
+            'open': self.pool.size,
+            'idle': self.pool.freesize,
+            'in_use': self.pool.size - self.pool.freesize,
+        }
+
+
+class AsyncPredictor:
+    """Async data access around the shared MaintenancePredictor (same cache and results)"""
+
+    def __init__(self, predictor, database):
+        self.predictor = predictor
+        self.db = database
+        self.flight = AsyncSingleFlight()
+        self._encoded = (None, {})  # (payload object, {format: bytes})
+
+    async def get_data_fingerprint(self):
+        row = await self.db.fetchone(FINGERPRINT_QUERY, dictionary=False)
+        return tuple(str(value) for value in row)
+
+    async def compute_all_predictions(self):
+        try:
+            vehicles = await self.db.fetchall(FLEET_QUERY)
+            return await run_cpu(self.predictor.predictions_from_rows, vehicles)
+        except Exception as e:
+            return {'success': False, 'message': f'Error: {str(e)}'}
+
+    async def predict_all_vehicles(self):
+        return await self.predictor.cache.get_or_compute_async(
+            ('all',),
+            lambda: self.flight.do(('all',), self.compute_all_predictions),
+            lambda: self.flight.do(('fingerprint',), self.get_data_fingerprint),
+            cacheable=lambda result: result.get('success')
+        )
+
+    async def predict_filtered(self, filters):
+        key = filters.cache_key()
+        return await self.predictor.cache.get_or_compute_async(
+            key,
+            lambda: self.flight.do(key, lambda: self.compute_filtered_predictions(filters)),
+            lambda: self.flight.do(('fingerprint',), self.get_data_fingerprint),
+            cacheable=lambda result: result.get('success')
+        )
+
+    async def get_vehicles(self, vehicle_ids):
+        vehicles = []
+        for start in range(0, len(vehicle_ids), BATCH_QUERY_IDS):
+            chunk = vehicle_ids[start:start + BATCH_QUERY_IDS]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            query = VEHICLES_QUERY.format(ids=placeholders)
+            vehicles.extend(await self.db.fetchall(query, tuple(chunk) * VEHICLES_QUERY.count('{ids}')))
+        return vehicles
+
+    async def compute_filtered_predictions(self, filters):
+        """Same SQL pushdown and keyset paging as MaintenancePredictor.compute_filtered_predictions"""
+        try:
+            if not filters.paged:
+                conditions, params = filters.sql()
+                vehicles = await self.db.fetchall(FLEET_QUERY_TEMPLATE.format(filters=conditions), params)
+                predictions = await run_cpu(fleet_engine.predict_fleet, vehicles, schedule_registry)
+                page, next_cursor = filters.select(predictions, prefiltered=True)
+                return {'success': True, 'data': page, 'count': len(page), 'next_cursor': next_cursor}
+
+            batch = filters.limit if filters.urgency is None else max(filters.limit, URGENCY_SCAN_BATCH)
+            page, next_cursor, after = [], None, filters.after
+            while next_cursor is None:
+                conditions, params = filters.sql(after)
+                params['limit'] = batch
+                rows = await self.db.fetchall(VEHICLE_IDS_QUERY.format(filters=conditions), params, dictionary=False)
+                ids = [row[0] for row in rows]
+                predictions = await run_cpu(fleet_engine.predict_fleet, await self.get_vehicles(ids), schedule_registry)
+                selected, next_cursor = filters.select(predictions, prefiltered=True, limit=filters.limit - len(page))
+                page.extend(selected)
+                if len(ids) < batch:
+                    break
+                after = ids[-1]
+            return {'success': True, 'data': page, 'count': len(page), 'next_cursor': next_cursor}
+        except Exception as e:
+            return {'success': False, 'message': f'Error: {str(e)}'}
+
+    async def stream_predictions(self, filters):
+        """NDJSON chunks for the vehicles matching `filters`, fetched and predicted batch by batch"""
+        conditions, params = filters.sql()
+        now = datetime.now()
+        async with aclosing(self.db.stream(FLEET_QUERY_TEMPLATE.format(filters=conditions), params or None)) as batches:
+            async for rows in batches:
+                yield await run_cpu(prediction_stream.encode_batch, rows, filters, now)
+
+    async def predict_vehicle(self, vehicle_id):
+        async def compute():
+            vehicle = await self.db.fetchone(VEHICLE_QUERY, {'vehicle_id': vehicle_id})
+            if vehicle is None:
+                return None
+            return await run_cpu(self.predictor.build_prediction, vehicle)
+
+        return await self.flight.do(('vehicle', vehicle_id), compute)
+
+    async def maintenance_calendar(self, horizon_days, group):
+        key = ('calendar', horizon_days, group)
+
+        async def compute():
+            try:
+                vehicles = await self.db.fetchall(FLEET_QUERY)
+                return await run_cpu(maintenance_calendar.fleet_calendar, vehicles, schedule_registry,
+                                     horizon_days, group)
+            except Exception as e:
+                return {'success': False, 'message': f'Error: {str(e)}'}
+
+        return await self.predictor.cache.get_or_compute_async(
+            key,
+            lambda: self.flight.do(key, compute),
+            lambda: self.flight.do(('fingerprint',), self.get_data_fingerprint),
+            cacheable=lambda result: result.get('success')
+        )
+
+    async def generation(self, predictions, scope=None):
+        """change_tracking generation of a served list, computed once off the event loop"""
+        return await self.flight.do(('generation', id(predictions)),
+                                    lambda: run_cpu(self.predictor.changes.generation, predictions, scope))
+
+    async def encode(self, payload, fmt='json'):
+        """Encoded bytes of a shared payload (cached result, snapshot predictions).
+
+        The same object is served to every poller until it is replaced, so it
+        is encoded once per format, off the event loop.
+        """
+        source, encoded = self._encoded
+        if source is payload and fmt in encoded:
+            return encoded[fmt]
+
+        async def encode():
+            body = await run_cpu(response_formats.encode, payload, fmt)
+            source, encoded = self._encoded
+            if source is not payload:
+                encoded = {}
+            encoded[fmt] = body
+            self._encoded = (payload, encoded)
+            return body
+
+        return await self.flight.do(('encode', id(payload), fmt), encode)
+
+
+database = AsyncDatabase()
+service = AsyncPredictor(predictor, database)
+
+
+async def health_check(request):
+    """Health check endpoint with database connection test"""
+    try:
+        await database.ping()
+        return json_response({
+            'success': True,
+            'status': 'healthy',
+            'database': 'connected',
+            'pool': database.stats()
+        })
+    except Exception as e:
+        return json_response({
+            'success': False,
+            'status': 'healthy',
+            'database': 'error',
+            'error': str(e),
+            'pool': database.stats()
+        }, 503)
+
+
+async def status(request):
+    """Get server and model status"""
+    try:
+        result = await run_blocking(predictor.get_status)
+        result['data']['server'] = 'asgi'
+        return json_response(result)
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Server error: {str(e)}'}, 500)
+
+
+async def current_snapshot():
+    snapshot = predictor.snapshots.current
+    if snapshot is None:
+        snapshot = await run_blocking(predictor.snapshots.wait_ready, SNAPSHOT_WAIT_TIMEOUT)
+    return snapshot
+
+
+async def predict_all(request):
+    """Get predictions for all vehicles (same filter parameters as ml_server)"""
+    try:
+        try:
+            filters = PredictionFilters.from_args(request.query_params)
+        except FilterError as e:
+            return json_response({'success': False, 'message': str(e)}, 400)
+
+        if prediction_stream.wants_stream(request.query_params, request.headers.get('accept')):
+            return await stream_predictions(request, filters)
+
+        fmt = response_formats.negotiate(request.query_params, request.headers.get('accept'))
+        if fmt is None:
+            return json_response({'success': False, 'message': response_formats.not_acceptable_message()}, 406)
+        media_type = response_formats.MEDIA_TYPES[fmt]
+
+        snapshot = None
+        if predictor.snapshots.enabled:
+            snapshot = await current_snapshot()
+            if snapshot is None:
+                return json_response({'success': False, 'message': 'Prediction snapshot not ready'}, 503)
+            if filters.active:
+                page, next_cursor = await run_cpu(predictor.snapshots.select, snapshot, filters)
+                result = {'success': True, 'data': page, 'count': len(page),
+                          'next_cursor': next_cursor, 'snapshot': predictor.snapshots.meta()}
+            else:
+                result = {'success': True, 'data': snapshot.predictions, 'snapshot': predictor.snapshots.meta()}
+        else:
+            if filters.active:
+                result = await service.predict_filtered(filters)
+            else:
+                result = await service.predict_all_vehicles()
+            if not result.get('success'):
+                return json_response(result)
+
+        scope = filters.cache_key() if filters.active else None
+        generation = await service.generation(result['data'], scope)
+        headers = {'Vary': 'Accept', 'X-Change-Token': generation.token}
+        since = request.query_params.get('since')
+        if since:
+            envelope = {key: value for key, value in result.items() if key not in ('data', 'count')}
+            envelope.update(await run_cpu(predictor.changes.delta, result['data'],
+                                          change_tracking.parse_token(since), scope))
+            body = await run_cpu(response_formats.encode, envelope, fmt)
+            return Response(body, media_type=media_type, headers=headers)
+
+        headers['ETag'] = change_tracking.etag(generation.token, fmt)
+        if change_tracking.etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+            return Response(status_code=304, headers=headers)
+
+        if snapshot is None:
+            body = await service.encode(result, fmt)
+        elif not filters.active and fmt == 'json':
+            # The envelope differs per request (snapshot age): splice the shared encoded list into it
+            data = await service.encode(snapshot.predictions)
+            body = b'{"success": true, "data": ' + data + b', "snapshot": ' + dumps(predictor.snapshots.meta()) + b'}'
+        else:
+            body = await run_cpu(response_formats.encode, result, fmt)
+        return Response(body, media_type=media_type, headers=headers)
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Server error: {str(e)}'}, 500)
+
+
+async def encode_chunks(predictions):
+    """NDJSON chunks of predictions already in memory, encoded off the event loop"""
+    size = prediction_stream.STREAM_BATCH_SIZE
+    for start in range(0, len(predictions), size):
+        yield await run_cpu(prediction_stream.encode_lines, predictions[start:start + size])
+
+
+async def stream_body(first, chunks, gzip):
+    """Async counterpart of prediction_stream.response_body"""
+    encoder = prediction_stream.GzipStream() if gzip else None
+    try:
+        if first:
+            yield await run_cpu(encoder.compress, first) if encoder else first
+        async for chunk in chunks:
+            if chunk:
+                yield await run_cpu(encoder.compress, chunk) if encoder else chunk
+    except Exception as e:
+        print(f"[ERROR] Prediction stream failed: {e}")
+        error = prediction_stream.error_line(e)
+        yield encoder.compress(error) if encoder else error
+    finally:
+        # Client gone: release the stream's DB connection now, not when the generator is collected
+        await chunks.aclose()
+    if encoder:
+        yield encoder.finish()
+
+
+async def stream_predictions(request, filters):
+    """NDJSON /predict_all response (see ml_server.stream_predictions)"""
+    if predictor.snapshots.enabled:
+        snapshot = await current_snapshot()
+        if snapshot is None:
+            return json_response({'success': False, 'message': 'Prediction snapshot not ready'}, 503)
+        predictions = snapshot.predictions
+        if filters.active:
+            predictions = (await run_cpu(filters.select, predictions))[0]
+        chunks = encode_chunks(predictions)
+    elif filters.paged:
+        result = await service.predict_filtered(filters)
+        if not result.get('success'):
+            return json_response(result)
+        chunks = encode_chunks(result['data'])
+    else:
+        chunks = service.stream_predictions(filters)
+
+    try:
+        first = await anext(chunks, None)
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Error: {str(e)}'})
+
+    gzip = prediction_stream.accepts_gzip(request.headers.get('accept-encoding'))
+    headers = {'Vary': 'Accept, Accept-Encoding', 'X-Accel-Buffering': 'no'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(stream_body(first, chunks, gzip), media_type=prediction_stream.NDJSON, headers=headers)
+
+
+async def predict(request):
+    """Get prediction for a single vehicle"""
+    try:
+        vehicle_id = request.query_params.get('vehicle_id')
+        if not vehicle_id:
+            return json_response({'success': False, 'message': 'vehicle_id required'}, 400)
+        try:
+            vehicle_id = int(vehicle_id)
+        except ValueError:
+            return json_response({'success': False, 'message': 'vehicle_id must be an integer'}, 400)
+
+        if predictor.snapshots.enabled:
+            snapshot = await current_snapshot()
+            if snapshot is not None and vehicle_id in snapshot.by_id:
+                return vehicle_response(request, {'success': True, 'data': snapshot.by_id[vehicle_id],
+                                                  'snapshot': predictor.snapshots.meta()})
+
+        # Not in snapshot mode, or a vehicle added since the last snapshot
+        prediction = await service.predict_vehicle(vehicle_id)
+        if prediction is None:
+            return json_response({'success': False, 'message': 'Vehicle not found'}, 404)
+        return vehicle_response(request, {'success': True, 'data': prediction})
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Server error: {str(e)}'}, 500)
+
+
+def vehicle_response(request, result):
+    """Single prediction with a strong ETag (see ml_server.vehicle_response)"""
+    tag = change_tracking.etag(format(change_tracking.digest(result['data']), '016x'))
+    if change_tracking.etag_matches(request.headers.get('if-none-match'), tag):
+        return Response(status_code=304, headers={'ETag': tag})
+    return Response(dumps(result), media_type='application/json', headers={'ETag': tag})
+
+
+async def events(request):
+    """Server-Sent Events: urgency level transitions (see ml_server.events)"""
+    try:
+        levels = PredictionFilters.from_args(request.query_params).urgency
+    except FilterError as e:
+        return json_response({'success': False, 'message': str(e)}, 400)
+    last_event_id = request.headers.get('last-event-id') or request.query_params.get('last_event_id')
+
+    # The poller runs in a thread (sync DB pool); subscribing may start it
+    try:
+        subscription = await run_blocking(
+            predictor.events.subscribe, AsyncSubscription(asyncio.get_running_loop(), levels), last_event_id)
+    except TooManySubscribers as e:
+        response = json_response({'success': False, 'message': str(e)}, 503)
+        response.headers['Retry-After'] = str(EVENTS_RETRY_AFTER)
+        return response
+
+    async def stream():
+        try:
+            yield STREAM_PREAMBLE
+            while not subscription.overflowed:
+                chunk = await subscription.get(EVENTS_HEARTBEAT)
+                yield HEARTBEAT if chunk is None else chunk
+        finally:
+            predictor.events.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def calendar(request):
+    """Projected maintenance calendar (see ml_server.calendar)"""
+    try:
+        try:
+            horizon_days, group = maintenance_calendar.parse_args(request.query_params)
+        except maintenance_calendar.CalendarError as e:
+            return json_response({'success': False, 'message': str(e)}, 400)
+        return json_response(await service.maintenance_calendar(horizon_days, group))
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Server error: {str(e)}'}, 500)
+
+
+async def events_stats(request):
+    return json_response({'success': True, 'data': predictor.events.stats()})
+
+
+def read_training_stats():
+    if os.path.exists(predictor.stats_file):
+        with open(predictor.stats_file, 'r') as f:
+            return json.load(f)
+    return None
+
+
+async def stats(request):
+    """Get model training statistics"""
+    try:
+        return json_response({'success': True, 'data': await run_blocking(read_training_stats)})
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Server error: {str(e)}'}, 500)
+
+
+async def train(request):
+    """Start training in the background (?wait=1 waits for it without blocking the loop)"""
+    try:
+        if INFERENCE_ONLY:
+            return json_response({'success': False, 'message': 'Training is disabled in inference-only mode'}, 403)
+
+        # Same job manager as the Flask server: training runs on its own thread
+        job, created = await run_blocking(training_jobs.submit)
+        if request.query_params.get('wait') in ('1', 'true'):
+            return json_response(job_result(await run_blocking(training_jobs.wait, job['job_id'])))
+
+        return json_response({
+            'success': True,
+            'message': 'Training started' if created else 'Training already in progress',
+            'job_id': job['job_id'],
+            'coalesced': not created,
+            'job': job
+        }, 202)
+    except Exception as e:
+        return json_response({'success': False, 'message': f'Server error: {str(e)}'}, 500)
+
+
+async def train_status(request):
+    """Status and per-phase timings of a training job"""
+    job = await run_blocking(training_jobs.get, request.path_params['job_id'])
+    if job is None:
+        return json_response({'success': False, 'message': 'Training job not found'}, 404)
+    return json_response({'success': True, 'data': job})
+
+
+async def poll_model_registry():
+    """Pick up model versions published by other workers (Flask does this per request)"""
+    while True:
+        await asyncio.sleep(max(predictor.registry.poll_interval, 1))
+        try:
+            await run_blocking(predictor.refresh_model)
+        except Exception as e:
+            print(f"[WARNING] Model registry poll failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await database.start()
+    predictor.events.max_subscribers = ASGI_EVENTS_MAX_SUBSCRIBERS
+    predictor.snapshots.ensure_started()
+    if predictor.features:
+        predictor.features.ensure_started()
+    poller = asyncio.create_task(poll_model_registry())
+    try:
+        yield
+    finally:
+        poller.cancel()
+        await database.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/status', status, methods=['GET']),
+        Route('/predict_all', predict_all, methods=['GET']),
+        Route('/predict', predict, methods=['GET']),
+        Route('/stats', stats, methods=['GET']),
+        Route('/events', events, methods=['GET']),
+        Route('/events/stats', events_stats, methods=['GET']),
+        Route('/calendar', calendar, methods=['GET']),
+        Route('/train', train, methods=['POST']),
+        Route('/train/{job_id}', train_status, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 8080))
+    print(f"[SERVER] Smart Track ML Server (ASGI) starting on port {port}...")
+    uvicorn.run(app, host='0.0.0.0', port=port, backlog=int(os.getenv('ASGI_BACKLOG', 2048)),
+                timeout_keep_alive=int(os.getenv('ASGI_KEEPALIVE', 30)))
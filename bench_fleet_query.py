@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Fleet Query Benchmark
+Compares the old correlated-subquery fleet query with fleet_engine.FLEET_QUERY
+(pre-aggregated derived tables). Prints the query plans and timings.
+
+Runs on a generated SQLite stand-in by default, or on the configured MySQL
+database (DB_HOST/DB_USER/DB_PASS/DB_NAME) with --mysql.
+
+Usage:
+  python bench_fleet_query.py                                  # 10k vehicles / 2M GPS rows
+  python bench_fleet_query.py --vehicles 10000 --gps-rows 100000000 --skip-correlated
+  python bench_fleet_query.py --db fleet_bench.sqlite --reuse  # reuse a generated database
+  python bench_fleet_query.py --mysql
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from fleet_engine import FLEET_QUERY
+
+# Query used by get_all_vehicles before the derived-table rewrite
+CORRELATED_QUERY = """
+    SELECT
+        v.id as vehicle_id,
+        v.article,
+        v.plate_number,
+        v.created_at as vehicle_created,
+        COALESCE(v.current_mileage, 0) as current_mileage,
+        (SELECT COUNT(*) FROM maintenance_schedules WHERE vehicle_id = v.id) as maintenance_count,
+        (SELECT MAX(scheduled_date) FROM maintenance_schedules WHERE vehicle_id = v.id) as last_maintenance_date,
+        (SELECT COUNT(*) FROM gps_logs gl
+         JOIN gps_devices gd ON gl.device_id = gd.id
+         WHERE gd.vehicle_id = v.id
+         AND gl.timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)) as gps_points_last_week
+    FROM fleet_vehicles v
+    WHERE v.status = 'active'
+    ORDER BY v.id
+"""
+
+SQLITE_SCHEMA = """
+    CREATE TABLE fleet_vehicles (
+        id INTEGER PRIMARY KEY, article TEXT, plate_number TEXT, status TEXT,
+        created_at TEXT, current_mileage REAL
+    );
+    CREATE TABLE gps_devices (id INTEGER PRIMARY KEY, vehicle_id INTEGER);
+    CREATE TABLE maintenance_schedules (
+        id INTEGER PRIMARY KEY, vehicle_id INTEGER, scheduled_date TEXT
+    );
+    CREATE TABLE gps_logs (
+        id INTEGER PRIMARY KEY, device_id INTEGER, latitude REAL, longitude REAL,
+        speed REAL, timestamp TEXT
+    );
+"""
+
+def to_sqlite(query):
+    """Translate the MySQL-only bits of the fleet queries"""
+    return query.replace("DATE_SUB(NOW(), INTERVAL 7 DAY)", "datetime('now', '-7 days')")
+
+def generate_sqlite(path, num_vehicles, gps_rows, history_days, batch_size=200000):
+    """Build a SQLite stand-in with the columns the fleet queries touch"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executescript(SQLITE_SCHEMA)
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    fmt = '%Y-%m-%d %H:%M:%S'
+
+    print(f"[BENCH] Generating {num_vehicles} vehicles...")
+    conn.executemany(
+        "INSERT INTO fleet_vehicles VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f'Vehicle {i}', f'BEN-{i:05d}', 'active' if i % 20 else 'inactive',
+          (now - timedelta(days=rng.randint(200, 2000))).strftime(fmt), rng.uniform(0, 120000))
+         for i in range(1, num_vehicles + 1))
+    )
+    conn.executemany("INSERT INTO gps_devices VALUES (?, ?)", ((i, i) for i in range(1, num_vehicles + 1)))
+    conn.executemany(
+        "INSERT INTO maintenance_schedules (vehicle_id, scheduled_date) VALUES (?, ?)",
+        ((rng.randint(1, num_vehicles), (now - timedelta(days=rng.randint(0, 1500))).strftime('%Y-%m-%d'))
+         for _ in range(num_vehicles * 10))
+    )
+    conn.commit()
+
+    print(f"[BENCH] Generating {gps_rows} GPS rows over {history_days} days...")
+    start = time.perf_counter()
+    base = now.timestamp()
+    span = history_days * 86400
+    inserted = 0
+    while inserted < gps_rows:
+        n = min(batch_size, gps_rows - inserted)
+        conn.executemany(
+            "INSERT INTO gps_logs (device_id, latitude, longitude, speed, timestamp) VALUES (?, ?, ?, ?, ?)",
+            ((rng.randint(1, num_vehicles), 14.6, 121.0, 40.0,
+              datetime.utcfromtimestamp(base - rng.random() * span).strftime(fmt))
+             for _ in range(n))
+        )
+        conn.commit()
+        inserted += n
+        if inserted % (batch_size * 25) == 0 or inserted == gps_rows:
+            rate = inserted / (time.perf_counter() - start)
+            print(f"   {inserted:,} rows ({rate:,.0f} rows/s)")
+
+    print("[BENCH] Creating indexes from fleet_indexes.sql...")
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fleet_indexes.sql')) as f:
+        conn.executescript(f.read())
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn
+
+def time_query(cursor, query, repeat):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query)
+        rows = len(cursor.fetchall())
+        timings.append(time.perf_counter() - start)
+    return rows, min(timings)
+
+def run_sqlite(args):
+    if args.reuse and os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+    else:
+        conn = generate_sqlite(args.db, args.vehicles, args.gps_rows, args.history_days)
+    cursor = conn.cursor()
+    queries = [('derived tables', to_sqlite(FLEET_QUERY))]
+    if not args.skip_correlated:
+        queries.append(('correlated subqueries', to_sqlite(CORRELATED_QUERY)))
+
+    for name, query in queries:
+        print(f"\n[PLAN] {name}")
+        cursor.execute('EXPLAIN QUERY PLAN ' + query)
+        for row in cursor.fetchall():
+            print(f"   {row[-1]}")
+        rows, best = time_query(cursor, query, args.repeat)
+        print(f"[TIME] {name}: {best * 1000:.1f} ms ({rows} vehicles)")
+    conn.close()
+
+def run_mysql(args):
+    from ml_server import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    queries = [('derived tables', FLEET_QUERY)]
+    if not args.skip_correlated:
+        queries.append(('correlated subqueries', CORRELATED_QUERY))
+
+    for name, query in queries:
+        print(f"\n[PLAN] {name}")
+        cursor.execute('EXPLAIN ' + query)
+        columns = [c[0] for c in cursor.description]
+        for row in cursor.fetchall():
+            print('   ' + ', '.join(f'{c}={v}' for c, v in zip(columns, row) if v is not None))
+        rows, best = time_query(cursor, query, args.repeat)
+        print(f"[TIME] {name}: {best * 1000:.1f} ms ({rows} vehicles)")
+    cursor.close()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fleet aggregation query')
+    parser.add_argument('--vehicles', type=int, default=10000)
+    parser.add_argument('--gps-rows', type=int, default=2_000_000,
+                        help='Default is the scale the SQLite numbers were measured at')
+    parser.add_argument('--history-days', type=int, default=90, help='GPS rows are spread over this many days')
+    parser.add_argument('--db', default='fleet_bench.sqlite', help='SQLite file for the stand-in database')
+    parser.add_argument('--reuse', action='store_true', help='Reuse an existing SQLite file instead of regenerating')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-correlated', action='store_true', help='Only time the derived-table query')
+    parser.add_argument('--mysql', action='store_true', help='Benchmark against the configured MySQL database')
+    args = parser.parse_args()
+
+    if args.mysql:
+        run_mysql(args)
+    else:
+        run_sqlite(args)
+
+if __name__ == '__main__':
+    main()
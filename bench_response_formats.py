@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Response Format Benchmark
+Encodes the /predict_all payload for a synthetic fleet in every format and
+reports body size (raw and gzip), server-side encode time and client-side
+decode time. No database or model needed.
+
+Formats: JSON (json module), JSON (orjson), MessagePack rows, Arrow IPC.
+Formats whose package is not installed are skipped.
+
+Usage:
+  python bench_response_formats.py                    # 10k and 100k vehicles
+  python bench_response_formats.py --vehicles 50000 --repeat 5
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+
+import fleet_engine
+import response_formats
+from maintenance_schedule import REGISTRY as schedule_registry
+
+
+def make_rows(num_vehicles):
+    now = datetime.now()
+    return [{
+        'vehicle_id': i,
+        'article': f'Vehicle {i}',
+        'plate_number': f'BEN-{i:05d}',
+        'vehicle_created': now - timedelta(days=400 + i % 900),
+        'current_mileage': (i * 37) % 120000,
+        'maintenance_count': i % 7,
+        'last_maintenance_date': now - timedelta(days=i % 200) if i % 3 else None,
+        'gps_points_last_week': i % 500,
+    } for i in range(1, num_vehicles + 1)]
+
+
+def formats():
+    """(label, encode, decode) for every format available here"""
+    yield ('json', lambda payload: json.dumps(payload).encode(), json.loads)
+    if response_formats.orjson is not None:
+        orjson = response_formats.orjson
+        yield ('orjson', response_formats.dumps_json, orjson.loads)
+    if response_formats.msgpack is not None:
+        msgpack = response_formats.msgpack
+        yield ('msgpack', response_formats.encode_msgpack, msgpack.unpackb)
+    if response_formats.pyarrow is not None:
+        pyarrow = response_formats.pyarrow
+        yield ('arrow', response_formats.encode_arrow, lambda body: pyarrow.ipc.open_stream(body).read_all())
+
+
+def best_of(repeat, fn, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(num_vehicles, repeat):
+    payload = {'success': True, 'data': fleet_engine.predict_fleet(make_rows(num_vehicles), schedule_registry)}
+    print(f"[BENCH] {num_vehicles} vehicles")
+    print(f"  {'format':<8} {'size':>10} {'gzip':>10} {'encode':>10} {'decode':>10}")
+    for label, encode, decode in formats():
+        encode_time, body = best_of(repeat, encode, payload)
+        decode_time, _ = best_of(repeat, decode, body)
+        compressed = len(gzip.compress(body, 6))
+        print(f"  {label:<8} {len(body) / 1e6:>8.2f}MB {compressed / 1e6:>8.2f}MB "
+              f"{encode_time * 1000:>8.1f}ms {decode_time * 1000:>8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/predict_all payload size and encode/decode time per format')
+    parser.add_argument('--vehicles', type=int, action='append', help='Fleet size (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    for num_vehicles in args.vehicles or [10000, 100000]:
+        run(num_vehicles, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
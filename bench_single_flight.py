@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Request Coalescing Benchmark
+Fires N concurrent /predict_all requests at one worker and counts how many
+times the fleet query actually runs. The DB is simulated (fixed latency, no
+MySQL needed) and the prediction cache is disabled so only single-flight is
+measured.
+
+Usage:
+  python bench_single_flight.py                       # 100 concurrent requests
+  python bench_single_flight.py --requests 200 --db-latency 0.5 --vehicles 5000
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ['PREDICTION_CACHE_TTL'] = '0'
+
+import ml_server  # noqa: E402
+
+
+def make_rows(num_vehicles):
+    now = datetime.now()
+    return [{
+        'vehicle_id': i,
+        'article': f'Vehicle {i}',
+        'plate_number': f'BEN-{i:05d}',
+        'vehicle_created': now - timedelta(days=400 + i % 900),
+        'current_mileage': (i * 37) % 120000,
+        'maintenance_count': i % 7,
+        'last_maintenance_date': now - timedelta(days=i % 200) if i % 3 else None,
+        'gps_points_last_week': i % 500,
+    } for i in range(1, num_vehicles + 1)]
+
+
+def run(num_requests, rows, db_latency, coalesce):
+    predictor = ml_server.predictor
+    queries = {'count': 0}
+    lock = threading.Lock()
+
+    def fake_get_all_vehicles():
+        with lock:
+            queries['count'] += 1
+        time.sleep(db_latency)
+        return rows
+
+    predictor.get_all_vehicles = fake_get_all_vehicles
+    if coalesce:
+        handler = predictor.predict_all_vehicles
+    else:
+        handler = predictor.compute_all_predictions
+
+    barrier = threading.Barrier(num_requests)
+    latencies = []
+
+    def client():
+        barrier.wait()
+        start = time.perf_counter()
+        result = handler()
+        assert result['success']
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(num_requests)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    label = 'single-flight' if coalesce else 'no coalescing'
+    print(f"[BENCH] {label}: {num_requests} concurrent requests -> {queries['count']} fleet queries, "
+          f"wall {wall * 1000:.0f} ms, p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"max {latencies[-1] * 1000:.0f} ms")
+    return queries['count']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark request coalescing for /predict_all')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--db-latency', type=float, default=0.2, help='Simulated fleet query time in seconds')
+    args = parser.parse_args()
+
+    rows = make_rows(args.vehicles)
+    run(args.requests, rows, args.db_latency, coalesce=False)
+    count = run(args.requests, rows, args.db_latency, coalesce=True)
+    print(f"[BENCH] Single-flight stats: {ml_server.predictor.flight.stats()}")
+    if count != 1:
+        raise SystemExit(f"[ERROR] Expected 1 fleet query, got {count}")
+
+
+if __name__ == '__main__':
+    main()
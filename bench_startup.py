@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Cold Start Benchmark
+Measures, each in a fresh interpreter:
+- import time of ml_server (plus the slowest imports from -X importtime)
+- time from process start to the first /health response and to the model being loaded
+for the default and inference-only modes. Optional budgets make it fail (exit 1)
+on regressions, e.g. in CI or before a deploy.
+
+/health checks the database; by default DB_HOST points at 127.0.0.1 so an
+unreachable database fails fast instead of adding connect_timeout to the result.
+
+Usage:
+  python bench_startup.py
+  python bench_startup.py --repeat 5 --budget-import 1.0 --budget-health 3.0
+  python bench_startup.py --use-env-db        # keep the DB_* environment as is
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODES = {
+    'default': {},
+    'inference-only': {'INFERENCE_ONLY': '1'},
+}
+
+
+def make_env(extra, use_env_db):
+    # No startup training run against whatever database is configured
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1', AUTO_TRAIN='0', **extra)
+    if not use_env_db:
+        env['DB_HOST'] = '127.0.0.1'
+    return env
+
+
+def measure_import(env):
+    # One raw write: the background model loader may print at the same time
+    code = ("import os, time; t = time.perf_counter(); import ml_server; "
+            "os.write(1, b'\\nIMPORT_SECONDS %f\\n' % (time.perf_counter() - t))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    line = [l for l in out.splitlines() if l.startswith('IMPORT_SECONDS')][-1]
+    return float(line.split()[1])
+
+
+def slowest_imports(env, top):
+    """(cumulative ms, module) of the slowest top-level imports of ml_server"""
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ml_server'], cwd=HERE,
+                         env=env, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Direct children of ml_server are indented by three spaces
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(url):
+    """(status, json body) of a GET; HTTP errors still count as a response"""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def measure_server(env, timeout):
+    """Seconds from spawn to the first /health response and to the model load finishing"""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'ml_server.py'], cwd=HERE, env=dict(env, PORT=str(port)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health = model = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f'ml_server.py exited with code {proc.returncode}')
+            try:
+                if health is None:
+                    get(base + '/health')
+                    health = time.perf_counter() - start
+                _, status = get(base + '/status')
+                if not status.get('data', {}).get('model_loading', False):
+                    model = time.perf_counter() - start
+                    break
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait()
+    if health is None:
+        raise RuntimeError(f'No /health response within {timeout}s')
+    return health, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ml_server cold start')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8, help='Slowest imports to list')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--budget-import', type=float, default=None, help='Max median import seconds')
+    parser.add_argument('--budget-health', type=float, default=None, help='Max median seconds to first /health')
+    parser.add_argument('--use-env-db', action='store_true', help='Use the DB_* environment for /health')
+    args = parser.parse_args()
+
+    over_budget = []
+    for mode, extra in MODES.items():
+        env = make_env(extra, args.use_env_db)
+        imports = [measure_import(env) for _ in range(args.repeat)]
+        runs = [measure_server(env, args.timeout) for _ in range(args.repeat)]
+        import_s = statistics.median(imports)
+        health_s = statistics.median(h for h, _ in runs)
+        model_times = [m for _, m in runs if m is not None]
+        model_s = statistics.median(model_times) if model_times else None
+
+        model_text = f'{model_s * 1000:.0f} ms' if model_s is not None else 'not finished'
+        print(f"[BENCH] {mode}: import {import_s * 1000:.0f} ms, first /health {health_s * 1000:.0f} ms, "
+              f"model loaded {model_text}")
+        for ms, name in slowest_imports(env, args.top):
+            print(f"          {ms:8.1f} ms  {name}")
+
+        if args.budget_import is not None and import_s > args.budget_import:
+            over_budget.append(f'{mode} import {import_s:.2f}s > {args.budget_import}s')
+        if args.budget_health is not None and health_s > args.budget_health:
+            over_budget.append(f'{mode} first /health {health_s:.2f}s > {args.budget_health}s')
+
+    if over_budget:
+        raise SystemExit('[ERROR] Startup budget exceeded: ' + '; '.join(over_budget))
+
+
+if __name__ == '__main__':
+    main()
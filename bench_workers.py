@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Gunicorn Worker Memory Benchmark (Linux)
+Starts gunicorn with gunicorn.conf.py, with and without preload_app, sends some
+/predict_batch traffic and reports per-worker memory from /proc/<pid>/smaps_rollup:
+- RSS: resident pages, shared ones counted in full for every worker
+- PSS: shared pages split between the processes sharing them
+- USS: pages private to the worker (what one more worker really costs)
+
+A model is published to a temporary registry first unless --registry points at one.
+
+Usage:
+  python bench_workers.py
+  python bench_workers.py --workers 4 --threads 4 --requests 200
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def publish_model(registry_dir):
+    from xgboost import XGBRegressor
+    from sklearn.preprocessing import StandardScaler
+    from model_registry import FEATURE_NAMES, ModelRegistry
+
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0, 1000, size=(20000, len(FEATURE_NAMES)))
+    y = X[:, 0] * 0.1 + X[:, 1] * 0.5 - X[:, 2]
+    scaler = StandardScaler().fit(X)
+    model = XGBRegressor(n_estimators=100, max_depth=6, learning_rate=0.1, random_state=42)
+    model.fit(scaler.transform(X), y)
+    return ModelRegistry(root=registry_dir).publish(model, scaler, {'samples_used': len(X)})
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def post_json(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def wait_up(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2)
+            return
+        except urllib.error.HTTPError:
+            return
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            # The master accepts connections before the workers have booted
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not come up within {timeout}s')
+
+
+def memory_kb(pid):
+    """(rss, pss, uss) in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':'):
+                values[parts[0][:-1]] = int(parts[1])
+    uss = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values.get('Rss', 0), values.get('Pss', 0), uss
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def run(preload, args, env):
+    port = free_port()
+    env = dict(env, PORT=str(port), GUNICORN_PRELOAD='1' if preload else '0',
+               WEB_CONCURRENCY=str(args.workers), WEB_THREADS=str(args.threads))
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'ml_server:app'],
+                            cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f'http://127.0.0.1:{port}'
+        wait_up(base + '/status', args.timeout)
+        # Every worker has to be up and to have served traffic before measuring
+        deadline = time.monotonic() + args.timeout
+        while len(worker_pids(proc.pid)) < args.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        rows = np.random.default_rng(0).uniform(0, 1000, size=(args.rows, 5)).tolist()
+        for _ in range(args.requests):
+            post_json(base + '/predict_batch', {'rows': rows})
+        time.sleep(0.5)
+
+        master = memory_kb(proc.pid)
+        workers = [memory_kb(pid) for pid in worker_pids(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    label = 'preload' if preload else 'no preload'
+    avg = [sum(w[i] for w in workers) / len(workers) / 1024 for i in range(3)]
+    total_pss = (master[1] + sum(w[1] for w in workers)) / 1024
+    print(f"[BENCH] {label}: {len(workers)} workers, per worker RSS {avg[0]:.1f} MB, "
+          f"PSS {avg[1]:.1f} MB, USS {avg[2]:.1f} MB; master RSS {master[0] / 1024:.1f} MB; "
+          f"total PSS {total_pss:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-worker memory with and without preload_app')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='/predict_batch requests before measuring')
+    parser.add_argument('--rows', type=int, default=1000, help='Rows per /predict_batch request')
+    parser.add_argument('--registry', default=None, help='Existing model registry to serve')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    registry = args.registry
+    if registry is None:
+        tmp_dir = tempfile.mkdtemp(prefix='bench_workers_')
+        registry = os.path.join(tmp_dir, 'model_registry')
+        print(f"[INFO] Published model {publish_model(registry)} to {registry}")
+    # No DB needed: /predict_batch with raw rows never queries it
+    env = dict(os.environ, MODEL_REGISTRY_DIR=registry, AUTO_TRAIN='0', DB_HOST='127.0.0.1')
+    try:
+        run(False, args, env)
+        run(True, args, env)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
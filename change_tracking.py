@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Change Tracking (ETags and deltas)
+- Every served prediction list gets a generation: a 64-bit digest per vehicle
+  and a token (digest of all of them), computed once per list object (cached
+  result or snapshot) and reused by every request that serves it
+- The token is the strong ETag of the data: If-None-Match answers 304 before
+  anything is encoded
+- ?since=<token> returns only the vehicles whose prediction changed (plus the
+  ids that disappeared) against a recent generation
+- Tokens depend only on the data, so every worker issues the same token for the
+  same predictions; a token that is no longer in this worker's history gets the
+  full list back (delta: false)
+- Memo and history are kept per scope (the full list, or one filter set), so
+  filtered pages never push the full list's generations out
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from response_formats import dumps_json
+
+CHANGE_HISTORY = int(os.getenv('CHANGE_HISTORY', 8))
+# Filter sets tracked at once (least recently used dropped first; the full list always stays)
+CHANGE_SCOPES = int(os.getenv('CHANGE_SCOPES', 32))
+
+# Generations memoized by list identity (cached result, snapshot, filtered page)
+_RECENT_LISTS = 4
+
+
+def digest(prediction):
+    """64-bit digest of one prediction: CRC-32 and Adler-32 of its JSON.
+
+    Only compared against the same vehicle's previous digest, so two cheap
+    checksums are enough (a blake2b call per vehicle costs more than encoding it).
+    """
+    data = dumps_json(prediction)
+    return zlib.crc32(data) << 32 | zlib.adler32(data)
+
+
+def etag(token, fmt='json'):
+    """Strong ETag; the response format is part of the representation"""
+    return f'"{token}"' if fmt == 'json' else f'"{token}.{fmt}"'
+
+
+def parse_token(value):
+    """Token from a ?since= value (the bare token or an ETag copied as is)"""
+    value = (value or '').strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    return value.strip('"').split('.', 1)[0]
+
+
+def etag_matches(if_none_match, tag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate == tag:
+            return True
+    return False
+
+
+class Generation:
+    """Vehicle ids and digests of one prediction list, sorted by vehicle id"""
+
+    __slots__ = ('token', 'ids', 'digests', 'order')
+
+    def __init__(self, predictions):
+        ids = np.fromiter((p['vehicle_id'] for p in predictions), dtype=np.int64, count=len(predictions))
+        digests = np.fromiter((digest(p) for p in predictions), dtype=np.uint64, count=len(predictions))
+        # Positions in the served list, in vehicle id order
+        self.order = np.argsort(ids, kind='stable')
+        self.ids = ids[self.order]
+        self.digests = digests[self.order]
+        self.token = hashlib.blake2b(self.ids.tobytes() + self.digests.tobytes(), digest_size=12).hexdigest()
+
+    def changed_since(self, previous):
+        """(positions in the served list of new/changed vehicles, ids no longer present)"""
+        if len(previous.ids) == 0:
+            return np.sort(self.order), previous.ids
+        index = np.minimum(np.searchsorted(previous.ids, self.ids), len(previous.ids) - 1)
+        same = (previous.ids[index] == self.ids) & (previous.digests[index] == self.digests)
+        changed = np.sort(self.order[~same])
+        removed = np.setdiff1d(previous.ids, self.ids, assume_unique=True)
+        return changed, removed
+
+
+class _Scope:
+    __slots__ = ('recent', 'history')
+
+    def __init__(self):
+        self.recent = []  # [(predictions, generation)], most recent last
+        self.history = OrderedDict()  # token -> generation
+
+
+class ChangeTracker:
+    def __init__(self, history=None, scopes=None):
+        self.history_size = history if history is not None else CHANGE_HISTORY
+        self.max_scopes = scopes if scopes is not None else CHANGE_SCOPES
+        self._lock = threading.Lock()
+        self._scopes = OrderedDict({None: _Scope()})  # scope -> _Scope; None is the full list
+
+    def _scope(self, scope):
+        tracked = self._scopes.get(scope)
+        if tracked is None:
+            tracked = self._scopes[scope] = _Scope()
+            while len(self._scopes) > self.max_scopes + 1:
+                del self._scopes[next(key for key in self._scopes if key is not None)]
+        self._scopes.move_to_end(scope)
+        return tracked
+
+    def generation(self, predictions, scope=None):
+        """Generation of a prediction list (memoized by identity within its scope)"""
+        with self._lock:
+            tracked = self._scopes.get(scope)
+            for source, generation in tracked.recent if tracked else ():
+                if source is predictions:
+                    return generation
+        generation = Generation(predictions)
+        with self._lock:
+            tracked = self._scope(scope)
+            # Keep a reference to the list so its id can't be reused while memoized
+            tracked.recent = (tracked.recent + [(predictions, generation)])[-_RECENT_LISTS:]
+            tracked.history.pop(generation.token, None)
+            tracked.history[generation.token] = generation
+            while len(tracked.history) > self.history_size:
+                tracked.history.popitem(last=False)
+        return generation
+
+    def delta(self, predictions, since, scope=None):
+        """Response payload with the predictions changed since token `since`"""
+        generation = self.generation(predictions, scope)
+        with self._lock:
+            tracked = self._scopes.get(scope)
+            previous = tracked.history.get(since) if tracked else None
+        if previous is None:
+            return {'success': True, 'data': list(predictions), 'removed': [], 'delta': False,
+                    'token': generation.token}
+        changed, removed = generation.changed_since(previous)
+        return {'success': True, 'data': [predictions[i] for i in changed.tolist()],
+                'removed': removed.tolist(), 'delta': True, 'since': since, 'token': generation.token}
+
+    def reset(self):
+        with self._lock:
+            self._scopes = OrderedDict({None: _Scope()})
+
+    def stats(self):
+        with self._lock:
+            return {'generations': sum(len(tracked.history) for tracked in self._scopes.values()),
+                    'filter_scopes': len(self._scopes) - 1,
+                    'history_size': self.history_size}
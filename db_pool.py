@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Smart Track - MySQL Connection Pool
+- Process-wide pool shared by the ML server request handlers
+- Pre-ping validation of idle connections and max-lifetime recycling
+- Pool wait metrics (exposed on /health)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB connections created by `factory`.
+
+    Sized per process (i.e. per gunicorn worker): the shared host limit must
+    accommodate workers x DB_POOL_SIZE connections.
+    """
+
+    def __init__(self, factory, size=None, max_lifetime=None, wait_timeout=None, ping_interval=None):
+        self.factory = factory
+        self.size = size or int(os.getenv('DB_POOL_SIZE', 4))
+        self.max_lifetime = max_lifetime if max_lifetime is not None else float(os.getenv('DB_POOL_RECYCLE', 1800))
+        self.wait_timeout = wait_timeout if wait_timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 10))
+        self.ping_interval = ping_interval if ping_interval is not None else float(os.getenv('DB_POOL_PING_INTERVAL', 10))
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._open = 0
+        self._generation = 0  # bumped by close_all; older borrowed connections are closed on return
+        self._stats = {
+            'borrows': 0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'connections_discarded': 0,
+            'ping_failures': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+        }
+
+    def _check_fork(self):
+        # Connections inherited from a parent process share its sockets; drop
+        # them without closing so the parent's sessions stay intact.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _acquire(self):
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        waited = False
+        with self._cond:
+            self._check_fork()
+            self._stats['borrows'] += 1
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection available after {self.wait_timeout}s (pool size {self.size})')
+                waited = True
+                self._cond.wait(remaining)
+            generation = self._generation
+            wait_ms = (time.monotonic() - start) * 1000
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['wait_time_total_ms'] += wait_ms
+            self._stats['wait_time_max_ms'] = max(self._stats['wait_time_max_ms'], wait_ms)
+
+        try:
+            return self._validate(entry) + (generation,)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _validate(self, entry):
+        """Return a live (conn, created_at) pair, replacing stale connections"""
+        now = time.monotonic()
+        if entry is not None:
+            conn, created_at, last_used = entry
+            if now - created_at > self.max_lifetime:
+                self._close_quietly(conn)
+                self._bump('connections_recycled')
+            elif now - last_used < self.ping_interval:
+                return conn, created_at
+            else:
+                try:
+                    conn.ping(reconnect=False, attempts=1)
+                    return conn, created_at
+                except Exception:
+                    self._close_quietly(conn)
+                    self._bump('ping_failures')
+        conn = self.factory()
+        self._bump('connections_created')
+        return conn, time.monotonic()
+
+    def _release(self, conn, created_at, generation, broken=False):
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            broken = broken or generation != self._generation
+            if broken:
+                self._open -= 1
+                self._stats['connections_discarded'] += 1
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+        if broken:
+            self._close_quietly(conn)
+
+    def _bump(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is returned to the pool on exit"""
+        conn, created_at, generation = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            # The connection state is unknown after a failure (or an abandoned
+            # streaming generator: GeneratorExit); don't reuse it
+            self._release(conn, created_at, generation, broken=True)
+            raise
+        else:
+            if getattr(conn, 'in_transaction', False):
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._release(conn, created_at, generation, broken=True)
+                    return
+            self._release(conn, created_at, generation)
+
+    def reset(self):
+        """Forget all connections without closing them (e.g. right after a fork)"""
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def close_all(self):
+        """Close idle connections (borrowed ones are closed on return)"""
+        with self._cond:
+            self._check_fork()
+            self._generation += 1
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Pool usage and wait metrics"""
+        with self._cond:
+            self._check_fork()
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open'] = self._open
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._open - len(self._idle)
+        stats['wait_time_total_ms'] = round(stats['wait_time_total_ms'], 2)
+        stats['wait_time_max_ms'] = round(stats['wait_time_max_ms'], 2)
+        stats['wait_time_avg_ms'] = round(stats['wait_time_total_ms'] / stats['borrows'], 3) if stats['borrows'] else 0.0
+        return stats
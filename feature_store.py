@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Vehicle Feature Store
+- vehicle_features: one row per vehicle with the aggregates the fleet queries
+  used to compute from raw rows (maintenance count, last maintenance date) and a
+  7-slot ring buffer of daily GPS point counts and kilometres (slot = day
+  ordinal % 7), plus the last GPS fix applied so distance continues across updates
+- The updater applies only gps_logs / maintenance_schedules rows above the
+  high-water marks in feature_store_state, and zeroes the ring slots of days
+  that fell out of the 7-day window
+- The GPS mark only advances to a MAX(id) seen at least FEATURE_STORE_GPS_LAG
+  seconds earlier, so rows whose transactions commit after a higher id are
+  still above the mark when they become visible
+- With FEATURE_STORE=1 the server reads features with one primary-key join per
+  vehicle instead of aggregating maintenance and GPS rows on every query
+- Kilometres come from gps_distance (haversine between consecutive fixes,
+  outliers dropped); a rebuild recomputes the window device by device
+- The 7-day GPS activity covers whole calendar days (today and the 6 before),
+  not the last 168 hours
+
+Usage:
+  python feature_store.py --init       # create the tables and build from scratch
+  python feature_store.py              # apply new rows once
+  python feature_store.py --loop 60    # keep applying every 60 seconds
+  python feature_store.py --rebuild    # recompute everything (e.g. nightly)
+  python feature_store.py --status
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import timedelta
+
+import gps_distance
+
+RING_DAYS = 7
+GPS_SLOTS = tuple(f'gps_d{slot}' for slot in range(RING_DAYS))
+KM_SLOTS = tuple(f'km_d{slot}' for slot in range(RING_DAYS))
+GPS_SUM = ' + '.join(f'f.{column}' for column in GPS_SLOTS)
+KM_SUM = ' + '.join(f'f.{column}' for column in KM_SLOTS)
+LAST_FIX_COLUMNS = ('last_fix_device', 'last_fix_ts', 'last_fix_lat', 'last_fix_lon')
+
+# Columns added after the first release of the table (added by --init when missing)
+ADDED_COLUMNS = dict(
+    [(column, 'DOUBLE NOT NULL DEFAULT 0') for column in KM_SLOTS]
+    + [('last_fix_device', 'INT NULL'), ('last_fix_ts', 'DOUBLE NULL'),
+       ('last_fix_lat', 'DOUBLE NULL'), ('last_fix_lon', 'DOUBLE NULL')]
+)
+
+# feature_store_state columns added after the first release
+ADDED_STATE_COLUMNS = {'gps_seen_id': 'BIGINT NULL', 'gps_seen_at': 'DATETIME NULL'}
+
+FEATURE_STORE_UPDATE_INTERVAL = float(os.getenv('FEATURE_STORE_UPDATE_INTERVAL', 60))
+# Longest a gps_logs insert transaction is expected to stay open (0: apply up to MAX(id) at once)
+FEATURE_STORE_GPS_LAG = float(os.getenv('FEATURE_STORE_GPS_LAG', 30))
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS vehicle_features (
+        vehicle_id INT NOT NULL PRIMARY KEY,
+        maintenance_count INT NOT NULL DEFAULT 0,
+        last_maintenance_date DATETIME NULL,
+        """ + ''.join(f'{column} INT NOT NULL DEFAULT 0,\n        ' for column in GPS_SLOTS)
+    + ''.join(f'{column} {ddl},\n        ' for column, ddl in ADDED_COLUMNS.items()) + """updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feature_store_state (
+        id TINYINT NOT NULL PRIMARY KEY,
+        gps_last_id BIGINT NOT NULL DEFAULT 0,
+        maintenance_last_id BIGINT NOT NULL DEFAULT 0,
+        maintenance_rows BIGINT NOT NULL DEFAULT 0,
+        ring_day DATE NULL,
+        """ + ''.join(f'{column} {ddl},\n        ' for column, ddl in ADDED_STATE_COLUMNS.items()) + """updated_at DATETIME NULL
+    )
+    """,
+    "INSERT IGNORE INTO feature_store_state (id) VALUES (1)",
+]
+
+# Fleet queries over the store (same columns as the ml_server queries they replace)
+FLEET_QUERY_TEMPLATE = f"""
+    SELECT
+        v.id as vehicle_id,
+        v.article,
+        v.plate_number,
+        v.created_at as vehicle_created,
+        COALESCE(v.current_mileage, 0) as current_mileage,
+        COALESCE(f.maintenance_count, 0) as maintenance_count,
+        f.last_maintenance_date,
+        COALESCE({GPS_SUM}, 0) as gps_points_last_week,
+        COALESCE({KM_SUM}, 0) as km_last_week
+    FROM fleet_vehicles v
+    LEFT JOIN vehicle_features f ON f.vehicle_id = v.id
+    WHERE v.status = 'active'{{filters}}
+    ORDER BY v.id
+"""
+
+VEHICLE_QUERY = FLEET_QUERY_TEMPLATE.format(filters='\n      AND v.id = %(vehicle_id)s')
+
+VEHICLES_QUERY = FLEET_QUERY_TEMPLATE.format(filters='\n      AND v.id IN ({ids})')
+
+# Cache fingerprint addition: changes when the updater applies maintenance rows or rolls the day
+STATE_FINGERPRINT = """
+        (SELECT CONCAT_WS('|', maintenance_last_id, maintenance_rows, ring_day)
+         FROM feature_store_state WHERE id = 1) as feature_store_state"""
+
+STATE_QUERY = """
+    SELECT gps_last_id, maintenance_last_id, maintenance_rows, ring_day, updated_at,
+           gps_seen_id, TIMESTAMPDIFF(SECOND, gps_seen_at, NOW()) as gps_seen_age
+    FROM feature_store_state WHERE id = 1
+"""
+
+# Upper bounds of this run, read once so every step sees the same rows
+SOURCE_QUERY = """
+    SELECT CURDATE() as today,
+           (SELECT COALESCE(MAX(id), 0) FROM gps_logs) as gps_last_id,
+           (SELECT COALESCE(MAX(id), 0) FROM maintenance_schedules) as maintenance_last_id
+"""
+
+MAINTENANCE_COUNT_QUERY = "SELECT COUNT(*) FROM maintenance_schedules WHERE id <= %(upto)s"
+
+MAINTENANCE_DELTA_QUERY = """
+    SELECT vehicle_id, COUNT(*) as added, MAX(scheduled_date) as last_date
+    FROM maintenance_schedules
+    WHERE id > %(after)s AND id <= %(upto)s
+    GROUP BY vehicle_id
+"""
+
+MAINTENANCE_UPSERT = """
+    INSERT INTO vehicle_features (vehicle_id, maintenance_count, last_maintenance_date)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        maintenance_count = maintenance_count + VALUES(maintenance_count),
+        last_maintenance_date = CASE
+            WHEN last_maintenance_date IS NULL OR VALUES(last_maintenance_date) > last_maintenance_date
+            THEN VALUES(last_maintenance_date) ELSE last_maintenance_date END
+"""
+
+MAINTENANCE_REBUILD = [
+    "UPDATE vehicle_features SET maintenance_count = 0, last_maintenance_date = NULL",
+    """
+    INSERT INTO vehicle_features (vehicle_id, maintenance_count, last_maintenance_date)
+    SELECT vehicle_id, COUNT(*), MAX(scheduled_date)
+    FROM maintenance_schedules
+    WHERE id <= %(upto)s
+    GROUP BY vehicle_id
+    ON DUPLICATE KEY UPDATE
+        maintenance_count = VALUES(maintenance_count),
+        last_maintenance_date = VALUES(last_maintenance_date)
+    """,
+]
+
+LAST_FIX_QUERY = """
+    SELECT last_fix_device, vehicle_id, last_fix_ts, last_fix_lat, last_fix_lon
+    FROM vehicle_features
+    WHERE last_fix_device IS NOT NULL
+"""
+
+LAST_FIX_UPSERT = """
+    INSERT INTO vehicle_features (vehicle_id, last_fix_device, last_fix_ts, last_fix_lat, last_fix_lon)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        last_fix_device = VALUES(last_fix_device), last_fix_ts = VALUES(last_fix_ts),
+        last_fix_lat = VALUES(last_fix_lat), last_fix_lon = VALUES(last_fix_lon)
+"""
+
+
+def slot(day):
+    """Ring buffer slot of a calendar day"""
+    return day.toordinal() % RING_DAYS
+
+
+def expired_slots(ring_day, today):
+    """Slots to zero when the ring moves from `ring_day` to `today` (all of them on first use)"""
+    if ring_day is None or (today - ring_day).days >= RING_DAYS:
+        return list(range(RING_DAYS))
+    return [slot(ring_day + timedelta(days=offset)) for offset in range(1, (today - ring_day).days + 1)]
+
+
+def gps_bounds(applied, latest, seen_id, seen_age, lag):
+    """(gps id to apply up to, MAX(id) to remember, whether to restamp it) for one update.
+
+    A MAX(id) becomes the high-water mark only once it was seen `lag` seconds ago:
+    by then every lower id has committed or rolled back. The first build, with
+    nothing applied yet, can't wait and reads up to the current MAX(id).
+    """
+    if lag <= 0:
+        return latest, None, False
+    aged = seen_id is not None and seen_age is not None and seen_age >= lag
+    upto = max(applied, seen_id) if aged else applied
+    if aged or seen_id is None:
+        return upto or latest, latest, True
+    return upto or latest, seen_id, False
+
+
+def gps_upserts(distances, today):
+    """{slot: [(vehicle_id, points, km), ...]} for the days of a DistanceAccumulator inside the window"""
+    window_start = (today - timedelta(days=RING_DAYS - 1)).toordinal()
+    by_slot = {}
+    for (vehicle_id, day), points in distances.points.items():
+        if window_start <= day <= today.toordinal():
+            km = round(distances.km.get((vehicle_id, day), 0.0), 3)
+            by_slot.setdefault(day % RING_DAYS, []).append((vehicle_id, int(points), km))
+    return by_slot
+
+
+class FeatureStore:
+    def __init__(self, connection, interval=None, gps_lag=None):
+        """`connection()` is a context manager yielding a MySQL connection (db_pool.connection)"""
+        self.connection = connection
+        self.interval = interval if interval is not None else FEATURE_STORE_UPDATE_INTERVAL
+        self.gps_lag = gps_lag if gps_lag is not None else FEATURE_STORE_GPS_LAG
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.last_update = None
+        self.last_error = None
+
+    def create_schema(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            for table, added in (('vehicle_features', ADDED_COLUMNS), ('feature_store_state', ADDED_STATE_COLUMNS)):
+                cursor.execute(f"SHOW COLUMNS FROM {table}")
+                existing = {row[0] for row in cursor.fetchall()}
+                missing = [f'ADD COLUMN {column} {ddl}' for column, ddl in added.items() if column not in existing]
+                if missing:
+                    cursor.execute(f'ALTER TABLE {table} ' + ', '.join(missing))
+            conn.commit()
+            cursor.close()
+
+    def update(self, rebuild=False):
+        """Apply rows above the high-water marks (or rebuild everything) in one transaction.
+
+        The state row is locked for the duration, so concurrent updaters (one per
+        worker) run one after the other and the later ones find nothing to do.
+        """
+        start = time.perf_counter()
+        summary = {'rebuilt': [], 'maintenance_rows': 0, 'gps_points': 0, 'gps_km': 0.0, 'expired_days': 0}
+        with self.connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STATE_QUERY + ' FOR UPDATE')
+                state = cursor.fetchone()
+                if state is None:
+                    raise RuntimeError('feature_store_state is empty; run feature_store.py --init')
+                gps_after, maintenance_after, maintenance_rows, ring_day, _, gps_seen_id, gps_seen_age = state
+
+                cursor.execute(SOURCE_QUERY)
+                today, gps_latest, maintenance_upto = cursor.fetchone()
+                gps_upto, gps_seen_id, gps_restamp = gps_bounds(
+                    gps_after, gps_latest, gps_seen_id, gps_seen_age, self.gps_lag)
+
+                # Maintenance: add new rows; recount when rows were deleted or committed out of id order
+                cursor.execute(MAINTENANCE_COUNT_QUERY, {'upto': maintenance_upto})
+                source_rows = cursor.fetchone()[0]
+                cursor.execute(MAINTENANCE_DELTA_QUERY, {'after': maintenance_after, 'upto': maintenance_upto})
+                delta = cursor.fetchall()
+                added = sum(row[1] for row in delta)
+                if rebuild or source_rows != maintenance_rows + added:
+                    for statement in MAINTENANCE_REBUILD:
+                        cursor.execute(statement, {'upto': maintenance_upto})
+                    summary['rebuilt'].append('maintenance')
+                elif delta:
+                    cursor.executemany(MAINTENANCE_UPSERT, delta)
+                summary['maintenance_rows'] = source_rows - maintenance_rows
+
+                # GPS: roll the ring forward, then add the new points and distance to their day's slot
+                expired = list(range(RING_DAYS)) if rebuild else expired_slots(ring_day, today)
+                if expired:
+                    cursor.execute('UPDATE vehicle_features SET ' + ', '.join(
+                        f'{GPS_SLOTS[i]} = 0, {KM_SLOTS[i]} = 0' for i in expired))
+                    summary['expired_days'] = len(expired)
+                if len(expired) == RING_DAYS:
+                    # Whole window from the raw fixes, streamed device batch by device batch on a
+                    # second connection (rows above gps_upto are left for the next update). The day
+                    # before the window only provides the fix each first segment starts from.
+                    cursor.execute('UPDATE vehicle_features SET ' + ', '.join(f'{c} = NULL' for c in LAST_FIX_COLUMNS))
+                    distances = gps_distance.distance_window(
+                        self.connection, today - timedelta(days=RING_DAYS), today + timedelta(days=1), gps_upto)
+                    summary['rebuilt'].append('gps')
+                else:
+                    cursor.execute(LAST_FIX_QUERY)
+                    distances = gps_distance.DistanceAccumulator(
+                        {row[0]: tuple(row[1:]) for row in cursor.fetchall()})
+                    for chunk in gps_distance.stream_fixes(
+                            cursor, gps_distance.GPS_FIXES_AFTER_QUERY, (gps_after, gps_upto)):
+                        # Fixes dated after today would become the last fix and hide the real ones
+                        current = chunk[5] <= today.toordinal()
+                        distances.add(*(column[current] for column in chunk[:5]), day=chunk[5][current])
+                for i, values in gps_upserts(distances, today).items():
+                    cursor.executemany(
+                        f"INSERT INTO vehicle_features (vehicle_id, {GPS_SLOTS[i]}, {KM_SLOTS[i]}) VALUES (%s, %s, %s) "
+                        f"ON DUPLICATE KEY UPDATE {GPS_SLOTS[i]} = {GPS_SLOTS[i]} + VALUES({GPS_SLOTS[i]}), "
+                        f"{KM_SLOTS[i]} = {KM_SLOTS[i]} + VALUES({KM_SLOTS[i]})",
+                        values
+                    )
+                    summary['gps_points'] += sum(points for _, points, _ in values)
+                    summary['gps_km'] += sum(km for _, _, km in values)
+                last_fixes = [(distances.last[device][0], device, *distances.last[device][1:])
+                              for device in sorted(distances.updated)]
+                if last_fixes:
+                    cursor.executemany(LAST_FIX_UPSERT, last_fixes)
+                summary['gps_km'] = round(summary['gps_km'], 1)
+
+                cursor.execute(
+                    "UPDATE feature_store_state SET gps_last_id = %s, gps_seen_id = %s, "
+                    "gps_seen_at = IF(%s, NOW(), gps_seen_at), maintenance_last_id = %s, "
+                    "maintenance_rows = %s, ring_day = %s, updated_at = NOW() WHERE id = 1",
+                    (gps_upto, gps_seen_id, gps_restamp, maintenance_upto, source_rows, today)
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        summary['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self.last_update = summary
+        return summary
+
+    def status(self):
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(STATE_QUERY)
+            state = cursor.fetchone()
+            cursor.close()
+        return {
+            'state': {key: str(value) if value is not None else None for key, value in (state or {}).items()},
+            'last_update': self.last_update,
+            'last_error': self.last_error,
+            'update_interval_seconds': self.interval,
+            'gps_lag_seconds': self.gps_lag,
+        }
+
+    def ensure_started(self):
+        """Start the periodic updater thread (again after a fork); interval 0 leaves it to a cron/CLI"""
+        if self.interval <= 0:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='feature-store', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.update()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[WARNING] Feature store update failed: {e}")
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and incrementally update the vehicle feature store')
+    parser.add_argument('--init', action='store_true', help='Create the tables, then build from scratch')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute all features from the raw tables')
+    parser.add_argument('--loop', type=float, default=0, help='Keep updating every N seconds')
+    parser.add_argument('--status', action='store_true', help='Print the high-water marks and exit')
+    args = parser.parse_args()
+
+    from ml_server import db_pool
+
+    store = FeatureStore(db_pool.connection, interval=0)
+    if args.status:
+        print(store.status()['state'])
+        return
+    if args.init:
+        store.create_schema()
+        print("[SUCCESS] Feature store tables ready")
+
+    rebuild = args.init or args.rebuild
+    while True:
+        summary = store.update(rebuild=rebuild)
+        print(f"[INFO] Feature store updated: {summary}")
+        rebuild = False
+        if args.loop <= 0:
+            break
+        time.sleep(args.loop)
+
+
+if __name__ == '__main__':
+    main()
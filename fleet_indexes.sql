@@ -0,0 +1,17 @@
+-- Indexes backing the fleet aggregation in ml_server.py (FLEET_QUERY)
+-- Apply once: mysql -u USER -p DB_NAME < fleet_indexes.sql
+
+-- maintenance_schedules GROUP BY vehicle_id (count + last scheduled date)
+CREATE INDEX idx_maintenance_vehicle_date ON maintenance_schedules (vehicle_id, scheduled_date);
+
+-- 7-day gps_logs window: range scan on timestamp, device_id read from the index
+CREATE INDEX idx_gps_logs_timestamp_device ON gps_logs (timestamp, device_id);
+
+-- gps_devices -> vehicle mapping
+CREATE INDEX idx_gps_devices_vehicle ON gps_devices (vehicle_id);
+
+-- Active fleet scan in vehicle id order
+CREATE INDEX idx_fleet_vehicles_status ON fleet_vehicles (status, id);
+
+-- Single-vehicle lookups (/predict): one device's 7-day window
+CREATE INDEX idx_gps_logs_device_timestamp ON gps_logs (device_id, timestamp);
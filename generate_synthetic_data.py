@@ -2,42 +2,151 @@
 """
 Smart Track - Synthetic Data Generator for Maintenance Prediction
 Generates realistic synthetic data based on maintenance schedule for ML training
+
+Rows are written by BulkWriter: multi-row INSERT batches (executemany) or
+LOAD DATA LOCAL INFILE from a temporary CSV, committed every BULK_COMMIT_ROWS
+rows, with rows/second reporting. Configure with BULK_METHOD
+(executemany | load_data), BULK_BATCH_SIZE and BULK_COMMIT_ROWS.
 """
 
 import pandas as pd
 import numpy as np
 import mysql.connector
 from datetime import datetime, timedelta
+import csv
 import random
 import json
 import os
+import tempfile
+import time
+
+from maintenance_schedule import DEFAULT_SCHEDULE, REGISTRY
+
+BULK_METHOD = os.getenv('BULK_METHOD', 'executemany')
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 5000))
+BULK_COMMIT_ROWS = int(os.getenv('BULK_COMMIT_ROWS', 100000))
+
+MAINTENANCE_COLUMNS = ('vehicle_id', 'maintenance_type', 'scheduled_date', 'start_time', 'end_time',
+                       'status', 'notes', 'assigned_mechanic', 'created_at')
+GPS_COLUMNS = ('device_id', 'latitude', 'longitude', 'speed', 'timestamp')
+
+# Synthetic GPS tracks: depot (Manila), daily driving window, heading noise per fix (radians)
+GPS_DEPOT = np.array([14.5995, 120.9842])
+GPS_DAY_START = 6 * 3600
+GPS_DAY_END = 21 * 3600
+GPS_TURN_SIGMA = 0.5
+KM_PER_DEGREE = 111.32
+GPS_PARKED_SHARE = 0.3
+
+
+def gps_dtype(device_id):
+    """Structured dtype of generated GPS logs (device_id as int or fixed-width string, no object field)"""
+    return np.dtype([('device_id', np.asarray(device_id).dtype), ('latitude', 'f8'), ('longitude', 'f8'),
+                     ('speed', 'f8'), ('timestamp', 'datetime64[s]')])
+
+
+class BulkWriter:
+    """Buffered bulk insert into one table.
+
+    executemany: mysql.connector turns each batch into one multi-row INSERT.
+    load_data: each batch is written to a temporary CSV and loaded with
+    LOAD DATA LOCAL INFILE (needs allow_local_infile on the connection and
+    local_infile=ON on the server).
+    Commits every `commit_rows` rows, so a failure only loses the rows since
+    the last commit.
+    """
+
+    def __init__(self, conn, table, columns, method=None, batch_size=None, commit_rows=None):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.table = table
+        self.columns = tuple(columns)
+        self.method = method or BULK_METHOD
+        if self.method not in ('executemany', 'load_data'):
+            raise ValueError(f"Unknown bulk method: {self.method}")
+        self.batch_size = batch_size or BULK_BATCH_SIZE
+        self.commit_rows = commit_rows or BULK_COMMIT_ROWS
+        self.buffer = []
+        self.written = 0
+        self.committed = 0
+        self.started = time.perf_counter()
+        self.insert_query = (f"INSERT INTO {table} ({', '.join(self.columns)}) "
+                             f"VALUES ({', '.join(['%s'] * len(self.columns))})")
+
+    def write(self, rows):
+        """Add rows (tuples in column order); full batches are sent right away"""
+        for row in rows:
+            self.buffer.append(row)
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.method == 'load_data':
+            self._load_data(self.buffer)
+        else:
+            self.cursor.executemany(self.insert_query, self.buffer)
+        self.written += len(self.buffer)
+        self.buffer = []
+        if self.written - self.committed >= self.commit_rows:
+            self.commit()
+
+    def _load_data(self, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False) as f:
+            writer = csv.writer(f, lineterminator='\n')
+            # With an empty escape character LOAD DATA reads an unquoted NULL as SQL NULL
+            writer.writerows(tuple('NULL' if value is None else value for value in row) for row in rows)
+            path = f.name
+        try:
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' ({', '.join(self.columns)})",
+                (path,)
+            )
+        finally:
+            os.unlink(path)
+
+    def commit(self):
+        self.conn.commit()
+        self.committed = self.written
+        print(f"   💾 {self.table}: {self.committed:,} rows committed ({self.rate():,.0f} rows/s)")
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        """Flush, commit the remainder and return (rows, rows/s)"""
+        self.flush()
+        if self.written > self.committed:
+            self.commit()
+        self.cursor.close()
+        return self.written, self.rate()
+
+
+def segment_cumsum(values, starts):
+    """Cumulative sum restarting at each index in `starts` (sorted, starts[0] == 0)"""
+    values = values.copy()
+    totals = np.add.reduceat(values, starts)
+    # The running total entering each segment is the previous segment's own total
+    values[starts[1:]] -= totals[:-1]
+    return np.cumsum(values)
+
 
 class SyntheticDataGenerator:
-    def __init__(self, db_config):
+    def __init__(self, db_config, bulk_method=None, batch_size=None, commit_rows=None, seed=None):
         self.db_config = db_config
-        # Map user schedule to maintenance_schedules enum values
-        self.maintenance_schedule = {
-            5000: {"tasks": ["oil_change"], "months": 3},
-            10000: {"tasks": ["oil_change", "tire_rotation"], "months": 6},
-            15000: {"tasks": ["oil_change"], "months": 9},
-            20000: {"tasks": ["oil_change", "tire_rotation", "wheel_alignment", "brake_inspection"], "months": 12},
-            25000: {"tasks": ["oil_change"], "months": 15},
-            30000: {"tasks": ["oil_change", "tire_rotation"], "months": 18},
-            35000: {"tasks": ["oil_change"], "months": 21},
-            40000: {"tasks": ["oil_change", "tire_rotation", "wheel_alignment", "brake_inspection", "ac_maintenance"], "months": 24},
-            45000: {"tasks": ["oil_change", "battery_check"], "months": 27},
-            50000: {"tasks": ["oil_change", "tire_rotation"], "months": 30},
-            55000: {"tasks": ["oil_change"], "months": 33},
-            60000: {"tasks": ["oil_change", "tire_rotation", "wheel_alignment", "brake_inspection"], "months": 36},
-            65000: {"tasks": ["oil_change"], "months": 39},
-            70000: {"tasks": ["oil_change", "tire_rotation"], "months": 42},
-            75000: {"tasks": ["oil_change"], "months": 45},
-            80000: {"tasks": ["oil_change", "tire_rotation", "wheel_alignment", "brake_inspection", "ac_maintenance"], "months": 48},
-            85000: {"tasks": ["oil_change", "battery_check"], "months": 51},
-            90000: {"tasks": ["oil_change", "tire_rotation"], "months": 54},
-            95000: {"tasks": ["oil_change"], "months": 57},
-            100000: {"tasks": ["oil_change", "tire_rotation", "wheel_alignment", "brake_inspection"], "months": 60}
-        }
+        # Seeded generator for the vectorized GPS tracks (SYNTHETIC_SEED makes runs repeatable)
+        if seed is None and os.getenv('SYNTHETIC_SEED'):
+            seed = int(os.getenv('SYNTHETIC_SEED'))
+        self.rng = np.random.default_rng(seed)
+        self.bulk_method = bulk_method or BULK_METHOD
+        self.batch_size = batch_size
+        self.commit_rows = commit_rows
+        # Task schedule of the default vehicle class (maintenance_schedules enum values)
+        self.maintenance_schedule = DEFAULT_SCHEDULE.task_schedule()
     
     def connect_db(self):
         """Connect to MySQL database"""
@@ -47,6 +156,7 @@ class SyntheticDataGenerator:
                 user=self.db_config['user'],
                 password=self.db_config['password'],
                 database=self.db_config['database'],
+                allow_local_infile=self.bulk_method == 'load_data',
             )
             return connection
         except Exception as e:
@@ -82,9 +192,10 @@ class SyntheticDataGenerator:
         
         return int(base_gps_points * gps_variation)
     
-    def generate_maintenance_history(self, vehicle_id, vehicle_created, total_km):
+    def generate_maintenance_history(self, vehicle_id, vehicle_created, total_km, article=None):
         """Generate synthetic maintenance history for a vehicle"""
         maintenance_records = []
+        schedule = REGISTRY.for_article(article).task_schedule() if article else self.maintenance_schedule
         
         # Start from vehicle creation date
         if isinstance(vehicle_created, datetime):
@@ -97,7 +208,7 @@ class SyntheticDataGenerator:
         while current_km < total_km:
             # Find next maintenance milestone
             next_milestone = None
-            for km in sorted(self.maintenance_schedule.keys()):
+            for km in sorted(schedule.keys()):
                 if current_km < km:
                     next_milestone = km
                     break
@@ -119,7 +230,7 @@ class SyntheticDataGenerator:
                 break
             
             # Get maintenance tasks for this milestone
-            maintenance_info = self.maintenance_schedule[next_milestone]
+            maintenance_info = schedule[next_milestone]
             tasks = maintenance_info["tasks"]
             
             # Create maintenance record
@@ -145,103 +256,105 @@ class SyntheticDataGenerator:
         return maintenance_records
     
     def generate_gps_logs(self, vehicle_id, device_id, vehicle_created, total_km):
-        """Generate synthetic GPS logs for a vehicle"""
-        gps_records = []
+        """Generate synthetic GPS logs for a vehicle as a structured array (gps_dtype).
+        
+        Vectorized over the vehicle's whole history: one trip a day from the
+        vehicle's depot near Manila, a correlated random walk (the heading
+        drifts between fixes) whose steps add up to the day's 30-80 km, 10-50
+        fixes between 06:00 and 21:00 in time order (some of them parked), and
+        speed = km/h since the previous fix.
+        """
+        rng = self.rng
         
         # Start from vehicle creation
         if isinstance(vehicle_created, datetime):
-            current_date = vehicle_created
+            created = vehicle_created
         else:
-            current_date = datetime.strptime(vehicle_created, '%Y-%m-%d %H:%M:%S')
-        current_km = 0
+            created = datetime.strptime(vehicle_created, '%Y-%m-%d %H:%M:%S')
         
-        # Generate GPS points daily
-        while current_km < total_km and current_date < datetime.now():
-            # Daily usage varies
-            daily_km = random.uniform(30, 80)  # 30-80 km per day
-            
-            # Generate GPS points for this day
-            gps_points_today = random.randint(10, 50)  # 10-50 GPS points per day
-            
-            for i in range(gps_points_today):
-                # Simulate GPS coordinates (Philippines area)
-                lat = 14.5995 + random.uniform(-0.1, 0.1)  # Manila area
-                lng = 120.9842 + random.uniform(-0.1, 0.1)
-                
-                # Add some movement simulation
-                lat += random.uniform(-0.001, 0.001)
-                lng += random.uniform(-0.001, 0.001)
-                
-                # Generate timestamp within the day
-                hour = random.randint(6, 20)  # 6 AM to 8 PM
-                minute = random.randint(0, 59)
-                second = random.randint(0, 59)
-                
-                timestamp = current_date.replace(hour=hour, minute=minute, second=second)
-                
-                gps_record = {
-                    'device_id': device_id,
-                    'latitude': round(lat, 6),
-                    'longitude': round(lng, 6),
-                    'speed': random.uniform(0, 80),  # 0-80 km/h
-                    'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                }
-                
-                gps_records.append(gps_record)
-            
-            current_date += timedelta(days=1)
-            current_km += daily_km
+        # Days until the vehicle reaches total_km (or today)
+        max_days = max(int(np.ceil((datetime.now() - created).total_seconds() / 86400)), 0)
+        daily_km = rng.uniform(30, 80, max_days)
+        km_before = np.cumsum(daily_km) - daily_km
+        days = int(np.searchsorted(km_before, total_km, side='left'))
+        daily_km = daily_km[:days]
+        counts = rng.integers(10, 51, days)
+        n = int(counts.sum())
+        if n == 0:
+            return np.empty(0, dtype=gps_dtype(device_id))
+        day = np.repeat(np.arange(days), counts)
+        first = np.cumsum(counts) - counts
+        
+        # Fix times in order within each day (uniform order statistics from normalized
+        # exponential gaps, no sort); the first step starts at 06:00 from the depot
+        gaps = rng.standard_exponential(n)
+        elapsed = segment_cumsum(gaps, first)
+        span = np.add.reduceat(gaps, first) + rng.standard_exponential(days)
+        offsets = (elapsed / span[day] * (GPS_DAY_END - GPS_DAY_START)).astype(np.int64)
+        seconds = day * 86400 + GPS_DAY_START + offsets
+        dt = np.diff(seconds, prepend=0)
+        dt[first] = seconds[first] - (day[first] * 86400 + GPS_DAY_START)
+        # The day's km split over the moving intervals, each at its own pace
+        pace = dt * np.maximum(rng.random(n) - GPS_PARKED_SHARE, 0)
+        day_pace = np.bincount(day, weights=pace, minlength=days)[day]
+        step_km = daily_km[day] * np.divide(pace, day_pace, out=np.zeros(n), where=day_pace > 0)
         
-        return gps_records
+        # Heading: random at departure, then small turns between fixes
+        turns = rng.normal(0, GPS_TURN_SIGMA, n)
+        turns[first] = rng.uniform(0, 2 * np.pi, days)
+        heading = segment_cumsum(turns, first)
+        
+        depot_lat, depot_lng = GPS_DEPOT + rng.normal(0, 0.02, 2)
+        dlat = step_km * np.cos(heading) / KM_PER_DEGREE
+        dlng = step_km * np.sin(heading) / (KM_PER_DEGREE * np.cos(np.radians(depot_lat)))
+        lat = segment_cumsum(dlat, first)
+        lng = segment_cumsum(dlng, first)
+        
+        records = np.empty(n, dtype=gps_dtype(device_id))
+        records['device_id'] = device_id
+        records['latitude'] = np.round(depot_lat + lat, 6)
+        records['longitude'] = np.round(depot_lng + lng, 6)
+        records['speed'] = np.round(np.divide(step_km * 3600, dt, out=np.zeros(n), where=dt > 0), 2)
+        records['timestamp'] = np.datetime64(created.date(), 's') + seconds.astype('timedelta64[s]')
+        return records
     
     def insert_synthetic_data(self, maintenance_records, gps_records):
-        """Insert synthetic data into database"""
+        """Insert synthetic data into database (bulk batches, periodic commits)"""
         conn = self.connect_db()
         if not conn:
             return False
         
+        writer = None
         try:
-            cursor = conn.cursor()
-            
-            # Insert maintenance records
             print(f"📝 Inserting {len(maintenance_records)} maintenance records...")
-            for record in maintenance_records:
-                query = """
-                INSERT INTO maintenance_schedules 
-                (vehicle_id, maintenance_type, scheduled_date, start_time, end_time, 
-                 status, notes, assigned_mechanic, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (
-                    record['vehicle_id'], record['maintenance_type'], 
-                    record['scheduled_date'], record['start_time'], record['end_time'],
-                    record['status'], record['notes'], record['assigned_mechanic'], 
-                    record['created_at']
-                ))
+            writer = self.bulk_writer(conn, 'maintenance_schedules', MAINTENANCE_COLUMNS)
+            writer.write(tuple(record[column] for column in MAINTENANCE_COLUMNS) for record in maintenance_records)
+            rows, rate = writer.close()
+            print(f"   ✅ {rows:,} maintenance records ({rate:,.0f} rows/s)")
             
-            # Insert GPS records
             print(f"📍 Inserting {len(gps_records)} GPS records...")
-            for record in gps_records:
-                query = """
-                INSERT INTO gps_logs 
-                (device_id, latitude, longitude, speed, timestamp)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (
-                    record['device_id'], record['latitude'], record['longitude'],
-                    record['speed'], record['timestamp']
-                ))
+            writer = self.bulk_writer(conn, 'gps_logs', GPS_COLUMNS)
+            if isinstance(gps_records, np.ndarray):
+                writer.write(gps_records[list(GPS_COLUMNS)].tolist())
+            else:
+                writer.write(tuple(record[column] for column in GPS_COLUMNS) for record in gps_records)
+            rows, rate = writer.close()
+            print(f"   ✅ {rows:,} GPS records ({rate:,.0f} rows/s)")
             
-            conn.commit()
             conn.close()
             return True
             
         except Exception as e:
             print(f"Error inserting synthetic data: {e}")
+            if writer is not None:
+                print(f"   {writer.table}: {writer.committed:,} rows were already committed")
             conn.rollback()
             conn.close()
             return False
     
+    def bulk_writer(self, conn, table, columns):
+        return BulkWriter(conn, table, columns, self.bulk_method, self.batch_size, self.commit_rows)
+    
     def generate_synthetic_data(self, num_vehicles=10, max_km=100000):
         """Generate synthetic data for multiple vehicles"""
         print("🚀 Starting synthetic data generation...")
@@ -286,7 +399,7 @@ class SyntheticDataGenerator:
             
             # Generate maintenance history
             maintenance_records = self.generate_maintenance_history(
-                vehicle['id'], vehicle['created_at'], total_km
+                vehicle['id'], vehicle['created_at'], total_km, vehicle['article']
             )
             
             # Generate GPS logs
@@ -309,6 +422,16 @@ class SyntheticDataGenerator:
         
         return True
     
+    def bench_gps_logs(self, num_vehicles=20, days=1500, total_km=100000):
+        """Time generate_gps_logs for vehicles `days` old (no database needed)"""
+        created = datetime.now() - timedelta(days=days)
+        start = time.perf_counter()
+        points = sum(len(self.generate_gps_logs(i, f'SYN-ESP32-{i}', created, total_km))
+                     for i in range(1, num_vehicles + 1))
+        elapsed = time.perf_counter() - start
+        print(f"📍 {points:,} GPS points for {num_vehicles} vehicles in {elapsed:.2f}s "
+              f"({points / elapsed:,.0f} points/s)")
+    
     def export_synthetic_data(self, filename="synthetic_data_sample.json"):
         """Export sample synthetic data for review"""
         sample_data = {
@@ -352,9 +475,11 @@ def main():
         print("Usage:")
         print("  python generate_synthetic_data.py generate [num_vehicles] [max_km]")
         print("  python generate_synthetic_data.py export")
+        print("  python generate_synthetic_data.py bench [num_vehicles]   # GPS generation points/s, no database")
         print("\nExamples:")
         print("  python generate_synthetic_data.py generate 5 50000")
         print("  python generate_synthetic_data.py generate 10 100000")
+        print("  BULK_METHOD=load_data BULK_BATCH_SIZE=50000 python generate_synthetic_data.py generate 100")
         return
     
     command = sys.argv[1]
@@ -373,6 +498,10 @@ def main():
         else:
             print("❌ Synthetic data generation failed!")
     
+    elif command == 'bench':
+        num_vehicles = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        generator.bench_gps_logs(num_vehicles)
+    
     elif command == 'export':
         print("📄 Exporting sample data structure...")
         generator.export_synthetic_data()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Smart Track - GPS Distance Aggregation
+- Kilometres travelled per vehicle and day from consecutive GPS fixes
+  (vectorized haversine over chunks of fixes ordered by device and timestamp)
+- Fixes with impossible coordinates are ignored; single-fix spikes (an
+  implausible jump out and straight back) are removed; segments faster than
+  GPS_MAX_SPEED_KMH are dropped
+- Each device's last fix is carried from one chunk to the next (and between
+  feature store updates), so chunking only matters for a spike that is the
+  very last fix of a chunk (then dropped by the speed check instead)
+- Memory is bounded by the chunk size plus one entry per device and per
+  (vehicle, day)
+
+Usage:
+  python gps_distance.py --bench                      # throughput on synthetic fixes
+  python gps_distance.py --bench --points 20000000 --devices 5000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+GPS_MAX_SPEED_KMH = float(os.getenv('GPS_MAX_SPEED_KMH', 200))
+GPS_CHUNK_ROWS = int(os.getenv('GPS_CHUNK_ROWS', 200000))
+
+# date.toordinal() of 1970-01-01 (days from timestamps) and of MySQL TO_DAYS() day 0
+EPOCH_ORDINAL = 719163
+TO_DAYS_OFFSET = 365
+
+# Fixes of a set of devices in (device, timestamp) order; served by
+# idx_gps_logs_device_timestamp. Day numbers come from MySQL so they match DATE().
+GPS_FIXES_QUERY = """
+    SELECT gd.vehicle_id, gl.device_id, UNIX_TIMESTAMP(gl.timestamp) * 1e0 as ts,
+           gl.latitude * 1e0 as lat, gl.longitude * 1e0 as lon, TO_DAYS(gl.timestamp) as day
+    FROM gps_logs gl
+    JOIN gps_devices gd ON gl.device_id = gd.id
+    WHERE gl.device_id IN ({ids})
+      AND gl.timestamp >= %s AND gl.timestamp < %s
+      AND gl.id <= %s
+    ORDER BY gl.device_id, gl.timestamp
+"""
+
+# Rows above a high-water mark (feature store updates), same columns and order
+GPS_FIXES_AFTER_QUERY = """
+    SELECT gd.vehicle_id, gl.device_id, UNIX_TIMESTAMP(gl.timestamp) * 1e0 as ts,
+           gl.latitude * 1e0 as lat, gl.longitude * 1e0 as lon, TO_DAYS(gl.timestamp) as day
+    FROM gps_logs gl
+    JOIN gps_devices gd ON gl.device_id = gd.id
+    WHERE gl.id > %s AND gl.id <= %s
+    ORDER BY gl.device_id, gl.timestamp
+"""
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between arrays of points given in degrees"""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def columns(rows):
+    """(vehicle, device, ts, lat, lon, day) arrays from GPS_FIXES_QUERY rows (day as date ordinal)"""
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0), np.empty(0), np.empty(0), empty
+    vehicle, device, ts, lat, lon, day = zip(*rows)
+    return (
+        np.array(vehicle, dtype=np.int64),
+        np.array(device, dtype=np.int64),
+        np.array(ts, dtype=np.float64),
+        # NULL coordinates become NaN and are dropped as invalid
+        np.array(lat, dtype=np.float64),
+        np.array(lon, dtype=np.float64),
+        np.array(day, dtype=np.int64) - TO_DAYS_OFFSET,
+    )
+
+
+class DistanceAccumulator:
+    def __init__(self, carry=None, max_speed_kmh=None):
+        """`carry`: {device: (vehicle, ts, lat, lon)} last accepted fixes from a previous run"""
+        self.max_speed_kmh = max_speed_kmh if max_speed_kmh is not None else GPS_MAX_SPEED_KMH
+        self.last = dict(carry or {})
+        self.updated = set()  # devices whose last fix moved in this run
+        self.km = {}  # (vehicle_id, day ordinal) -> km
+        self.points = {}  # (vehicle_id, day ordinal) -> fixes received (valid or not)
+        self.stats = {'points': 0, 'invalid': 0, 'late': 0, 'spikes': 0, 'segments': 0, 'too_fast': 0}
+
+    def add(self, vehicle, device, ts, lat, lon, day=None):
+        """One chunk of fixes ordered by (device, ts); `day` defaults to the UTC day of `ts`"""
+        n = len(ts)
+        if n == 0:
+            return
+        if day is None:
+            day = np.floor_divide(ts, 86400).astype(np.int64) + EPOCH_ORDINAL
+        self.stats['points'] += n
+        _accumulate(self.points, vehicle, day, np.ones(n))
+
+        valid = (np.isfinite(lat) & np.isfinite(lon) & np.isfinite(ts)
+                 & (np.abs(lat) <= 90) & (np.abs(lon) <= 180) & ~((lat == 0) & (lon == 0)))
+        self.stats['invalid'] += int(n - valid.sum())
+
+        # Last fixes carried in from the previous chunk/run for the devices of this chunk
+        devices = np.unique(device[valid])
+        carried = [d for d in devices.tolist() if d in self.last]
+        carry = np.array([self.last[d] for d in carried], dtype=np.float64).reshape(-1, 4)
+        carry_device = np.array(carried, dtype=np.int64)
+
+        # Fixes older than the device's carried fix arrived late: counted, not measured
+        carry_ts = np.full(len(devices), -np.inf)
+        if len(carried):
+            carry_ts[np.searchsorted(devices, carry_device)] = carry[:, 1]
+        late = valid.copy()
+        late[valid] = ts[valid] <= carry_ts[np.searchsorted(devices, device[valid])]
+        self.stats['late'] += int(late.sum())
+        keep = valid & ~late
+
+        is_carry = np.concatenate([np.ones(len(carried), dtype=bool), np.zeros(int(keep.sum()), dtype=bool)])
+        d = np.concatenate([carry_device, device[keep]])
+        v = np.concatenate([carry[:, 0].astype(np.int64), vehicle[keep]])
+        t = np.concatenate([carry[:, 1], ts[keep]])
+        la = np.concatenate([carry[:, 2], lat[keep]])
+        lo = np.concatenate([carry[:, 3], lon[keep]])
+        dy = np.concatenate([np.zeros(len(carried), dtype=np.int64), day[keep]])
+        if len(carried):
+            order = np.lexsort((t, d))
+            d, v, t, la, lo, dy, is_carry = (a[order] for a in (d, v, t, la, lo, dy, is_carry))
+
+        # Single-fix spikes: too fast in and out, while skipping the fix is plausible
+        if len(t) >= 3:
+            speed = self._speed(d, t, la, lo)
+            skip_ok = ((d[2:] == d[:-2]) & (t[2:] > t[:-2])
+                       & (haversine_km(la[:-2], lo[:-2], la[2:], lo[2:]) / (t[2:] - t[:-2]).clip(1e-9) * 3600
+                          <= self.max_speed_kmh))
+            spike = np.zeros(len(t), dtype=bool)
+            spike[1:-1] = (speed[:-1] > self.max_speed_kmh) & (speed[1:] > self.max_speed_kmh) & skip_ok
+            spike &= ~is_carry
+            if spike.any():
+                self.stats['spikes'] += int(spike.sum())
+                d, v, t, la, lo, dy = (a[~spike] for a in (d, v, t, la, lo, dy))
+
+        if len(t) == 0:
+            return
+        if len(t) >= 2:
+            same = d[1:] == d[:-1]
+            dist = haversine_km(la[:-1], lo[:-1], la[1:], lo[1:])
+            dt = t[1:] - t[:-1]
+            ok = same & (dt > 0)
+            fast = ok & (dist > self.max_speed_kmh * dt / 3600)
+            ok &= ~fast
+            self.stats['segments'] += int(ok.sum())
+            self.stats['too_fast'] += int(fast.sum())
+            # A segment counts on the day (and for the vehicle) of its end fix
+            _accumulate(self.km, v[1:][ok], dy[1:][ok], dist[ok])
+
+        last = np.flatnonzero(np.append(d[1:] != d[:-1], True))
+        self.updated.update(d[last].tolist())
+        for device_id, vehicle_id, ts_last, lat_last, lon_last in zip(
+                d[last].tolist(), v[last].tolist(), t[last].tolist(), la[last].tolist(), lo[last].tolist()):
+            self.last[device_id] = (vehicle_id, ts_last, lat_last, lon_last)
+
+    def _speed(self, d, t, la, lo):
+        """km/h of each segment (inf across devices or for non-increasing timestamps)"""
+        dt = t[1:] - t[:-1]
+        speed = np.full(len(dt), np.inf)
+        ok = (d[1:] == d[:-1]) & (dt > 0)
+        speed[ok] = haversine_km(la[:-1][ok], lo[:-1][ok], la[1:][ok], lo[1:][ok]) / dt[ok] * 3600
+        return speed
+
+    def daily_km(self, vehicle_id):
+        return {day: km for (vehicle, day), km in self.km.items() if vehicle == vehicle_id}
+
+
+def _accumulate(totals, vehicle, day, values):
+    """totals[(vehicle, day)] += values, grouped with NumPy first"""
+    if len(values) == 0:
+        return
+    keys = (vehicle.astype(np.int64) << 24) | (day.astype(np.int64) & 0xFFFFFF)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=values)
+    for key, value in zip(unique.tolist(), sums.tolist()):
+        pair = (key >> 24, key & 0xFFFFFF)
+        totals[pair] = totals.get(pair, 0.0) + value
+
+
+def stream_fixes(cursor, query, params, chunk_rows=None):
+    """Execute `query` and yield column chunks (see columns())"""
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(chunk_rows or GPS_CHUNK_ROWS)
+        if not rows:
+            break
+        yield columns(rows)
+
+
+def distance_window(connection, since, until, upto, device_batch=500, accumulator=None):
+    """Accumulate the fixes in [since, until) (ids <= upto) of every device, device batch by device batch"""
+    accumulator = accumulator or DistanceAccumulator()
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM gps_devices ORDER BY id")
+        devices = [row[0] for row in cursor.fetchall()]
+        for start in range(0, len(devices), device_batch):
+            batch = devices[start:start + device_batch]
+            query = GPS_FIXES_QUERY.format(ids=', '.join(['%s'] * len(batch)))
+            for chunk in stream_fixes(cursor, query, (*batch, since, until, upto)):
+                accumulator.add(*chunk[:5], day=chunk[5])
+        cursor.close()
+    return accumulator
+
+
+def synthetic_fixes(points, devices, seed=42, interval=10.0):
+    """Random-walk fixes ordered by (device, ts), with some spikes and invalid rows"""
+    rng = np.random.default_rng(seed)
+    per_device = points // devices
+    device = np.repeat(np.arange(1, devices + 1), per_device)
+    ts = 1.75e9 + np.tile(np.arange(per_device) * interval, devices)
+    step = rng.normal(0, 0.0015, size=(2, len(device)))  # ~150 m per 10 s
+    lat = 14.6 + np.cumsum(step[0].reshape(devices, per_device), axis=1).ravel()
+    lon = 121.0 + np.cumsum(step[1].reshape(devices, per_device), axis=1).ravel()
+    spikes = rng.random(len(device)) < 0.001
+    lat[spikes] += 1.0
+    lat[rng.random(len(device)) < 0.0005] = np.nan
+    return device.copy(), device, ts, lat, lon
+
+
+def bench(points, devices, chunk_rows):
+    vehicle, device, ts, lat, lon = synthetic_fixes(points, devices)
+    accumulator = DistanceAccumulator()
+    start = time.perf_counter()
+    for offset in range(0, len(ts), chunk_rows):
+        end = offset + chunk_rows
+        accumulator.add(vehicle[offset:end], device[offset:end], ts[offset:end], lat[offset:end], lon[offset:end])
+    elapsed = time.perf_counter() - start
+    total_km = sum(accumulator.km.values())
+    print(f"[BENCH] {len(ts):,} fixes, {devices} devices, chunks of {chunk_rows:,}: "
+          f"{elapsed:.2f}s ({len(ts) / elapsed / 1e6:.1f}M fixes/s)")
+    print(f"[BENCH] {total_km:,.0f} km total; {accumulator.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GPS distance aggregation')
+    parser.add_argument('--bench', action='store_true', help='Throughput on synthetic fixes')
+    parser.add_argument('--points', type=int, default=5000000)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--chunk-rows', type=int, default=GPS_CHUNK_ROWS)
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.points, args.devices, args.chunk_rows)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Smart Track - Gunicorn Configuration
+- Threaded workers (gthread): I/O-bound DB requests overlap inside one worker
+- preload_app: ml_server (model, schedule tables, numpy/xgboost) is imported once
+  in the master and shared copy-on-write by the forked workers
+- gc.freeze() before forking keeps the garbage collector from touching (and so
+  copying) the preloaded objects in every worker
+- post_fork re-initialises per-process state (DB pool, caches, snapshot thread)
+
+Usage: gunicorn -c gunicorn.conf.py ml_server:app
+"""
+
+import gc
+import os
+
+# Load the model synchronously in the master so workers inherit it
+os.environ.setdefault('MODEL_LOAD_MODE', 'eager')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+# /train runs as a background job; only POST /train?wait=1 holds a request for
+# the whole fit, so allow that much before the worker is killed
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Optional worker recycling (0 = never); jitter avoids all workers restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 50))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded, before the first fork
+    if preload_app:
+        gc.freeze()
+        server.log.info(f"Preloaded app frozen for copy-on-write ({gc.get_freeze_count()} objects)")
+
+
+def post_fork(server, worker):
+    # Pooled connections, locks and threads must not be shared with the master
+    if preload_app:
+        import ml_server
+        ml_server.reinit_after_fork()
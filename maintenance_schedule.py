@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Maintenance Schedule Registry
+- Single definition of the mileage/month maintenance schedules
+- One schedule per vehicle class (sedan, ambulance, truck), resolved from the vehicle article
+- Compiled at load time into sorted NumPy milestone arrays for O(log n) batched lookups
+- Past the last milestone the schedule repeats cyclically (computed arithmetically)
+"""
+
+import numpy as np
+
+# (km milestone, months, services, maintenance_schedules task types)
+BASE_SCHEDULE = [
+    (5000, 3, 'CHANGE OIL', ['oil_change']),
+    (10000, 6, 'CHANGE OIL, TIRE ROTATION', ['oil_change', 'tire_rotation']),
+    (15000, 9, 'CHANGE OIL', ['oil_change']),
+    (20000, 12, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection']),
+    (25000, 15, 'CHANGE OIL', ['oil_change']),
+    (30000, 18, 'CHANGE OIL, TIRE ROTATION', ['oil_change', 'tire_rotation']),
+    (35000, 21, 'CHANGE OIL', ['oil_change']),
+    (40000, 24, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION, COOLING SYSTEM',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection', 'ac_maintenance']),
+    (45000, 27, 'CHANGE OIL, ENGINE TUNE UP', ['oil_change', 'battery_check']),
+    (50000, 30, 'CHANGE OIL, TIRE ROTATION', ['oil_change', 'tire_rotation']),
+    (55000, 33, 'CHANGE OIL', ['oil_change']),
+    (60000, 36, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection']),
+    (65000, 39, 'CHANGE OIL', ['oil_change']),
+    (70000, 42, 'CHANGE OIL, TIRE ROTATION', ['oil_change', 'tire_rotation']),
+    (75000, 45, 'CHANGE OIL', ['oil_change']),
+    (80000, 48, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION, COOLING SYSTEM',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection', 'ac_maintenance']),
+    (85000, 51, 'CHANGE OIL, ENGINE TUNE UP', ['oil_change', 'battery_check']),
+    (90000, 54, 'CHANGE OIL, TIRE ROTATION', ['oil_change', 'tire_rotation']),
+    (95000, 57, 'CHANGE OIL', ['oil_change']),
+    (100000, 60, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection']),
+]
+
+# Heavy-duty diesel: 10k km / 6-month service interval
+TRUCK_SCHEDULE = [
+    (10000, 6, 'CHANGE OIL, FUEL FILTER', ['oil_change']),
+    (20000, 12, 'CHANGE OIL, TIRE ROTATION, BRAKE INSPECTION', ['oil_change', 'tire_rotation', 'brake_inspection']),
+    (30000, 18, 'CHANGE OIL, FUEL FILTER', ['oil_change']),
+    (40000, 24, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION, COOLING SYSTEM',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection', 'ac_maintenance']),
+    (50000, 30, 'CHANGE OIL, FUEL FILTER, ENGINE TUNE UP', ['oil_change', 'battery_check']),
+    (60000, 36, 'CHANGE OIL, TIRE ROTATION, BRAKE INSPECTION', ['oil_change', 'tire_rotation', 'brake_inspection']),
+    (70000, 42, 'CHANGE OIL, FUEL FILTER', ['oil_change']),
+    (80000, 48, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION, COOLING SYSTEM',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection', 'ac_maintenance']),
+    (90000, 54, 'CHANGE OIL, FUEL FILTER, ENGINE TUNE UP', ['oil_change', 'battery_check']),
+    (100000, 60, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION',
+     ['oil_change', 'tire_rotation', 'wheel_alignment', 'brake_inspection']),
+]
+
+SCHEDULES = {
+    'sedan': BASE_SCHEDULE,
+    # The fleet's ambulances follow the base specification for now; kept as
+    # its own class so it can diverge without touching the other vehicles
+    'ambulance': BASE_SCHEDULE,
+    'truck': TRUCK_SCHEDULE,
+}
+
+# Keywords matched (case-insensitively) against fleet_vehicles.article
+CLASS_KEYWORDS = {
+    'ambulance': ('ambulance',),
+    'truck': ('truck', 'lorry', 'dump', 'tanker'),
+}
+
+DEFAULT_CLASS = 'sedan'
+
+
+class Schedule:
+    """One vehicle class schedule compiled into sorted milestone arrays"""
+
+    def __init__(self, name, rows):
+        rows = sorted(rows, key=lambda row: row[0])
+        self.name = name
+        self.rows = tuple(rows)
+        self.km = np.array([row[0] for row in rows], dtype=np.float64)
+        self.months = np.array([row[1] for row in rows], dtype=np.int64)
+        self.services = np.array([row[2] for row in rows], dtype=object)
+        self.tasks = tuple(list(row[3]) for row in rows)
+        self.cycle_km = float(self.km[-1])
+
+    def lookup(self, current_km):
+        """Vectorized next milestone: (row index, milestone km) per mileage.
+
+        A mileage exactly on a milestone maps to that milestone. Past the last
+        milestone the table repeats, e.g. 105,000 km is the 5,000 km service
+        of the second cycle.
+        """
+        current_km = np.asarray(current_km, dtype=np.float64)
+        cycles = np.where(current_km > self.cycle_km, np.ceil(current_km / self.cycle_km) - 1, 0)
+        offset = current_km - cycles * self.cycle_km
+        idx = np.searchsorted(self.km, offset, side='left')
+        return idx, cycles * self.cycle_km + self.km[idx]
+
+    def milestone_count(self, km, side='right'):
+        """Vectorized number of milestones at or below `km` (side='right') or below it (side='left'),
+        counting the repeated cycles past the last milestone"""
+        km = np.asarray(km, dtype=np.float64)
+        cycles = np.floor(km / self.cycle_km)
+        return (cycles * len(self.km)).astype(np.int64) + np.searchsorted(self.km, km - cycles * self.cycle_km, side=side)
+
+    def crossings(self, start_km, end_km):
+        """Every milestone in [start_km, end_km] of each mileage range, vectorized.
+
+        Returns (range position, row index, milestone km), ordered by position
+        then milestone.
+        """
+        first = self.milestone_count(start_km, side='left')
+        counts = np.maximum(self.milestone_count(end_km) - first, 0)
+        position = np.repeat(np.arange(len(counts)), counts)
+        # Sequence number of each crossing within its range: 0, 1, ... per position
+        group_start = np.repeat(np.cumsum(counts) - counts, counts)
+        sequence = first[position] + np.arange(len(position)) - group_start
+        cycles, row = np.divmod(sequence, len(self.km))
+        return position, row, cycles * self.cycle_km + self.km[row]
+
+    def next_maintenance(self, current_km):
+        """Next maintenance for a single mileage"""
+        idx, milestone = self.lookup(current_km)
+        idx = int(idx)
+        months = int(self.months[idx])
+        return {
+            'km_milestone': float(milestone),
+            'months': months,
+            'services': self.services[idx],
+            'days_until': months * 30,  # 30 days per month
+            'km_until': float(milestone) - current_km
+        }
+
+    def task_schedule(self):
+        """{km: {'tasks': [...], 'months': m}} as used by the synthetic data scripts"""
+        return {int(row[0]): {'tasks': list(row[3]), 'months': row[1]} for row in self.rows}
+
+
+class ScheduleRegistry:
+    """Schedules keyed by vehicle class, plus fleet-wide batched lookups"""
+
+    def __init__(self, schedules, class_keywords=None, default_class=DEFAULT_CLASS):
+        self.class_names = list(schedules)
+        self.schedules = [Schedule(name, rows) for name, rows in schedules.items()]
+        self.class_keywords = class_keywords or {}
+        self.default_code = self.class_names.index(default_class)
+        self._codes = {}
+
+        # All classes concatenated so a (class, row) pair is one global index
+        self.offsets = np.cumsum([0] + [len(s.km) for s in self.schedules[:-1]])
+        self.months = np.concatenate([s.months for s in self.schedules])
+        self.services = np.concatenate([s.services for s in self.schedules])
+
+    def resolve(self, article):
+        """Vehicle class name for a fleet_vehicles.article value"""
+        return self.class_names[self.class_code(article)]
+
+    def class_code(self, article):
+        code = self._codes.get(article)
+        if code is None:
+            code = self.default_code
+            text = str(article or '').lower()
+            for name, keywords in self.class_keywords.items():
+                if any(keyword in text for keyword in keywords):
+                    code = self.class_names.index(name)
+                    break
+            self._codes[article] = code
+        return code
+
+    def class_codes(self, articles):
+        return np.fromiter((self.class_code(a) for a in articles), dtype=np.int64, count=len(articles))
+
+    def get(self, name):
+        return self.schedules[self.class_names.index(name)]
+
+    def for_article(self, article):
+        return self.schedules[self.class_code(article)]
+
+    def lookup(self, codes, current_km):
+        """Batched lookup: (global row index, milestone km) per vehicle"""
+        current_km = np.asarray(current_km, dtype=np.float64)
+        idx = np.empty(len(current_km), dtype=np.int64)
+        milestone = np.empty(len(current_km), dtype=np.float64)
+        for code, schedule in enumerate(self.schedules):
+            mask = codes == code
+            if mask.any():
+                local, milestone[mask] = schedule.lookup(current_km[mask])
+                idx[mask] = local + self.offsets[code]
+        return idx, milestone
+
+    def crossings(self, codes, start_km, end_km):
+        """Batched Schedule.crossings: (vehicle position, global row index, milestone km)"""
+        start_km = np.asarray(start_km, dtype=np.float64)
+        end_km = np.asarray(end_km, dtype=np.float64)
+        parts = []
+        for code, schedule in enumerate(self.schedules):
+            members = np.flatnonzero(codes == code)
+            if len(members):
+                position, row, milestone = schedule.crossings(start_km[members], end_km[members])
+                parts.append((members[position], row + self.offsets[code], milestone))
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+REGISTRY = ScheduleRegistry(SCHEDULES, CLASS_KEYWORDS)
+DEFAULT_SCHEDULE = REGISTRY.get(DEFAULT_CLASS)
@@ -3,55 +3,47 @@
 Smart Track Predictive Maintenance ML Server
 - Flask-based REST API
 - Algorithm: XGBoost Regressor
-- Maintenance Schedule: 5k km / 3-month intervals
+- Maintenance Schedule: 5k km / 3-month intervals (per vehicle class, see maintenance_schedule.py)
 - Heroku-ready deployment
 """
 
 import os
 import json
 import pickle
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
 
 import numpy as np
-import pandas as pd
-from xgboost import XGBRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
 import mysql.connector
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
-# Maintenance Schedule (Your specification)
-MAINTENANCE_SCHEDULE = [
-    (5000, 3, 'CHANGE OIL'),
-    (10000, 6, 'CHANGE OIL, TIRE ROTATION'),
-    (15000, 9, 'CHANGE OIL'),
-    (20000, 12, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION'),
-    (25000, 15, 'CHANGE OIL'),
-    (30000, 18, 'CHANGE OIL, TIRE ROTATION'),
-    (35000, 21, 'CHANGE OIL'),
-    (40000, 24, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION, COOLING SYSTEM'),
-    (45000, 27, 'CHANGE OIL, ENGINE TUNE UP'),
-    (50000, 30, 'CHANGE OIL, TIRE ROTATION'),
-    (55000, 33, 'CHANGE OIL'),
-    (60000, 36, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION'),
-    (65000, 39, 'CHANGE OIL'),
-    (70000, 42, 'CHANGE OIL, TIRE ROTATION'),
-    (75000, 45, 'CHANGE OIL'),
-    (80000, 48, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION, COOLING SYSTEM'),
-    (85000, 51, 'CHANGE OIL, ENGINE TUNE UP'),
-    (90000, 54, 'CHANGE OIL, TIRE ROTATION'),
-    (95000, 57, 'CHANGE OIL'),
-    (100000, 60, 'CHANGE OIL, TIRE ROTATION, WHEEL BALANCE, ALIGNMENT, BRAKE INSPECTION'),
-]
+import change_tracking
+import feature_store
+import fleet_engine
+import maintenance_calendar
+import prediction_stream
+import response_formats
+from db_pool import ConnectionPool
+from maintenance_schedule import REGISTRY as schedule_registry
+from prediction_cache import PredictionCache
+from single_flight import SingleFlight
+from prediction_snapshots import SnapshotScheduler
+from urgency_events import (EVENTS_HEARTBEAT, EVENTS_RETRY_AFTER, HEARTBEAT, STREAM_PREAMBLE, Subscription,
+                            TooManySubscribers, UrgencyEvents)
+from training_jobs import TrainingJobManager, job_result
+from model_registry import (FEATURE_NAMES, GPS_DISTANCE_FEATURES, GPS_POINT_FEATURES, FeatureMismatch,
+                            ModelRegistry, ScalerParams)
+from prediction_filters import URGENCY_SCAN_BATCH, FilterError, PredictionFilters
+from tree_ensemble import TreeEnsemble
 
-def get_db_connection():
-    """Connect to MySQL database"""
+def get_db_config():
+    """MySQL connection settings (shared with the async server)"""
     # Use environment variables (set in Heroku) or fallback to production defaults
     # Using IP address (153.92.15.8) for more reliable connection than hostname
-    db_config = {
+    return {
         'host': os.getenv('DB_HOST', '153.92.15.8'),  # Hostinger database IP address (hostname: srv1322.hstgr.io)
         'user': os.getenv('DB_USER', 'u520834156_uSmartTrck25'),
         'password': os.getenv('DB_PASS', 'xjOzav~2V'),
@@ -62,6 +54,10 @@ def get_db_connection():
         'connect_timeout': 10,
         'raise_on_warnings': False
     }
+
+def get_db_connection():
+    """Connect to MySQL database"""
+    db_config = get_db_config()
     
     try:
         conn = mysql.connector.connect(**db_config)
@@ -71,216 +67,418 @@ def get_db_connection():
         print(f"[DEBUG] Attempting to connect to: {db_config['host']} / {db_config['database']}")
         raise
 
+# Fleet features query (fleet_engine.py); {filters}: extra conditions on
+# fleet_vehicles v (prediction_filters)
+FLEET_QUERY_TEMPLATE = fleet_engine.FLEET_QUERY_TEMPLATE
+
+# One keyset page of filtered vehicle ids (idx_fleet_vehicles_status); the
+# features are then fetched for just these ids with VEHICLES_QUERY
+VEHICLE_IDS_QUERY = """
+    SELECT v.id
+    FROM fleet_vehicles v
+    WHERE v.status = 'active'{filters}
+    ORDER BY v.id
+    LIMIT %(limit)s
+"""
+
+# Single-vehicle variant: every aggregate is restricted by an indexed vehicle_id
+# (maintenance_schedules.vehicle_id, gps_devices.vehicle_id, gps_logs.device_id)
+# so the cost does not depend on fleet size
+VEHICLE_QUERY = """
+    SELECT 
+        v.id as vehicle_id,
+        v.article,
+        v.plate_number,
+        v.created_at as vehicle_created,
+        COALESCE(v.current_mileage, 0) as current_mileage,
+        (SELECT COUNT(*) FROM maintenance_schedules
+         WHERE vehicle_id = %(vehicle_id)s) as maintenance_count,
+        (SELECT MAX(scheduled_date) FROM maintenance_schedules
+         WHERE vehicle_id = %(vehicle_id)s) as last_maintenance_date,
+        (SELECT COUNT(*) FROM gps_logs gl
+         JOIN gps_devices gd ON gl.device_id = gd.id
+         WHERE gd.vehicle_id = %(vehicle_id)s
+         AND gl.timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)) as gps_points_last_week
+    FROM fleet_vehicles v
+    WHERE v.id = %(vehicle_id)s AND v.status = 'active'
+"""
+
+# Batch variant for an explicit list of vehicle ids ({ids}: one %s per id)
+VEHICLES_QUERY = """
+    SELECT 
+        v.id as vehicle_id,
+        v.article,
+        v.plate_number,
+        v.created_at as vehicle_created,
+        COALESCE(v.current_mileage, 0) as current_mileage,
+        COALESCE(ms.maintenance_count, 0) as maintenance_count,
+        ms.last_maintenance_date,
+        COALESCE(gps.gps_points_last_week, 0) as gps_points_last_week
+    FROM fleet_vehicles v
+    LEFT JOIN (
+        SELECT vehicle_id,
+               COUNT(*) as maintenance_count,
+               MAX(scheduled_date) as last_maintenance_date
+        FROM maintenance_schedules
+        WHERE vehicle_id IN ({ids})
+        GROUP BY vehicle_id
+    ) ms ON ms.vehicle_id = v.id
+    LEFT JOIN (
+        SELECT gd.vehicle_id,
+               COUNT(*) as gps_points_last_week
+        FROM gps_logs gl
+        JOIN gps_devices gd ON gl.device_id = gd.id
+        WHERE gd.vehicle_id IN ({ids})
+        AND gl.timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
+        GROUP BY gd.vehicle_id
+    ) gps ON gps.vehicle_id = v.id
+    WHERE v.id IN ({ids}) AND v.status = 'active'
+    ORDER BY v.id
+"""
+
+# Cheap change detection for the prediction cache: vehicle rows (mileage,
+# status, ...) and maintenance rows added or removed
+FINGERPRINT_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM fleet_vehicles) as vehicles,
+        (SELECT MAX(updated_at) FROM fleet_vehicles) as vehicles_updated,
+        (SELECT BIT_XOR(CRC32(CONCAT_WS('|', id, status, current_mileage, article, plate_number)))
+         FROM fleet_vehicles) as vehicles_checksum,
+        (SELECT COUNT(*) FROM maintenance_schedules) as maintenance_rows,
+        (SELECT MAX(id) FROM maintenance_schedules) as maintenance_last_id,
+        (SELECT MAX(scheduled_date) FROM maintenance_schedules) as maintenance_last_date{extra}
+"""
+
+# FEATURE_STORE=1: read maintenance and GPS aggregates from vehicle_features
+# (feature_store.py keeps it up to date) instead of aggregating raw rows per query
+FEATURE_STORE = os.getenv('FEATURE_STORE', '').lower() in ('1', 'true', 'yes')
+if FEATURE_STORE:
+    FLEET_QUERY_TEMPLATE = feature_store.FLEET_QUERY_TEMPLATE
+    VEHICLE_QUERY = feature_store.VEHICLE_QUERY
+    VEHICLES_QUERY = feature_store.VEHICLES_QUERY
+    # The cache also expires when the updater applies maintenance rows or rolls the GPS window
+    FINGERPRINT_QUERY = FINGERPRINT_QUERY.format(extra=',' + feature_store.STATE_FINGERPRINT)
+else:
+    FINGERPRINT_QUERY = FINGERPRINT_QUERY.format(extra='')
+# avg_daily_usage is km per day with the feature store, GPS points per day without;
+# models are only loaded where it means what they were trained on
+FEATURE_DEFINITIONS = GPS_DISTANCE_FEATURES if FEATURE_STORE else GPS_POINT_FEATURES
+FLEET_QUERY = FLEET_QUERY_TEMPLATE.format(filters='')
+
+# /predict_batch sizing: rows per inplace_predict call, ids per IN list, request cap
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 10000))
+BATCH_QUERY_IDS = 1000
+BATCH_MAX_ROWS = int(os.getenv('BATCH_MAX_ROWS', 100000))
+
+# Inference-only workers serve registry models with the NumPy tree evaluator and
+# never import xgboost or scikit-learn (training is disabled)
+INFERENCE_ONLY = os.getenv('INFERENCE_ONLY', '').lower() in ('1', 'true', 'yes')
+
+# 'background' loads the model (and imports xgboost) off the startup path; 'eager'
+# loads it in the constructor. Model-backed requests wait up to MODEL_LOAD_TIMEOUT.
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'background')
+MODEL_LOAD_TIMEOUT = float(os.getenv('MODEL_LOAD_TIMEOUT', 30))
+
+# Process-wide pool (one per gunicorn worker) used by the request handlers
+db_pool = ConnectionPool(get_db_connection)
+
 class MaintenancePredictor:
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
+        self.model_version = None
+        self.registry = ModelRegistry()
         self.is_trained = False
         self.model_file = 'maintenance_model.pkl'
         self.scaler_file = 'maintenance_scaler.pkl'
         self.stats_file = 'training_stats.json'
+        self.cache = PredictionCache()
+        # Concurrent requests in this worker share one in-flight computation
+        self.flight = SingleFlight()
+        # Optional background snapshots (PREDICTION_SNAPSHOT_INTERVAL > 0)
+        self.snapshots = SnapshotScheduler(self.compute_all_predictions)
+        # Per-vehicle digests of served results: ETags and ?since= deltas
+        self.changes = change_tracking.ChangeTracker()
+        # /events: urgency transitions, polled in the background while clients listen
+        self.events = self.create_event_source()
+        # Incremental feature store updater (FEATURE_STORE=1)
+        self.features = feature_store.FeatureStore(db_pool.connection) if FEATURE_STORE else None
         
         # Try to load existing model
-        if os.path.exists(self.model_file) and os.path.exists(self.scaler_file):
+        self._model_loaded = threading.Event()
+        self._loader_lock = threading.Lock()
+        self._loader_pid = None
+        if MODEL_LOAD_MODE == 'eager':
             self.load_model()
+            self._model_loaded.set()
+        else:
+            self.start_model_load()
     
-    def get_next_maintenance_from_schedule(self, current_km):
-        """Get next maintenance based on mileage schedule"""
-        for km, months, services in MAINTENANCE_SCHEDULE:
-            if current_km <= km:  # Changed from < to <= to include exact matches
-                km_until = km - current_km
-                # For synthetic vehicles, use month-based calculation instead of daily usage
-                days_until = months * 30  # Convert months to days (30 days per month)
-                return {
-                    'km_milestone': km,
-                    'months': months,
-                    'services': services,
-                    'days_until': days_until,
-                    'km_until': km_until
-                }
-        # If beyond last milestone, use default 90-day cycle
-        return {
-            'km_milestone': current_km + 5000,
-            'months': 3,
-            'services': 'CHANGE OIL',
-            'days_until': 90,
-            'km_until': 5000
-        }
+    def get_next_maintenance_from_schedule(self, current_km, article=None):
+        """Get next maintenance based on the mileage schedule of the vehicle's class"""
+        return schedule_registry.for_article(article).next_maintenance(current_km)
     
     def get_all_vehicles(self):
         """Fetch all active vehicles with maintenance data"""
-        conn = get_db_connection()
-        try:
+        with db_pool.connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT 
-                    v.id as vehicle_id,
-                    v.article,
-                    v.plate_number,
-                    v.created_at as vehicle_created,
-                    COALESCE(v.current_mileage, 0) as current_mileage,
-                    (SELECT COUNT(*) FROM maintenance_schedules WHERE vehicle_id = v.id) as maintenance_count,
-                    (SELECT MAX(scheduled_date) FROM maintenance_schedules WHERE vehicle_id = v.id) as last_maintenance_date,
-                    (SELECT COUNT(*) FROM gps_logs gl 
-                     JOIN gps_devices gd ON gl.device_id = gd.id 
-                     WHERE gd.vehicle_id = v.id 
-                     AND gl.timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)) as gps_points_last_week
-                FROM fleet_vehicles v
-                WHERE v.status = 'active'
-                ORDER BY v.id
-            """
-            cursor.execute(query)
+            cursor.execute(FLEET_QUERY)
             results = cursor.fetchall()
             cursor.close()
             return results
-        finally:
-            conn.close()
+    
+    def get_vehicle(self, vehicle_id):
+        """Fetch a single active vehicle with maintenance data"""
+        with db_pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(VEHICLE_QUERY, {'vehicle_id': vehicle_id})
+            result = cursor.fetchone()
+            cursor.close()
+            return result
+    
+    def get_vehicles(self, vehicle_ids):
+        """Fetch the active vehicles among `vehicle_ids` (one query)"""
+        if not vehicle_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(vehicle_ids))
+        with db_pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(VEHICLES_QUERY.format(ids=placeholders), tuple(vehicle_ids) * VEHICLES_QUERY.count('{ids}'))
+            results = cursor.fetchall()
+            cursor.close()
+            return results
+    
+    def get_filtered_vehicles(self, filters):
+        """Active vehicles matching the SQL-expressible filters (all pages)"""
+        conditions, params = filters.sql()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(FLEET_QUERY_TEMPLATE.format(filters=conditions), params)
+            results = cursor.fetchall()
+            cursor.close()
+            return results
+    
+    def get_vehicle_ids(self, filters, after, limit):
+        """Next `limit` active vehicle ids after `after` matching the SQL-expressible filters"""
+        conditions, params = filters.sql(after)
+        params['limit'] = limit
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(VEHICLE_IDS_QUERY.format(filters=conditions), params)
+            results = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            return results
+    
+    def stream_predictions(self, filters, batch_size=prediction_stream.STREAM_BATCH_SIZE):
+        """NDJSON chunks for the vehicles matching `filters`, fetched and predicted batch by batch"""
+        conditions, params = filters.sql()
+        now = datetime.now()
+        with db_pool.connection() as conn:
+            # Unbuffered cursor: rows are read from the server as they are fetched
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(FLEET_QUERY_TEMPLATE.format(filters=conditions), params or None)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield prediction_stream.encode_batch(rows, filters, now)
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    # Unread rows of an abandoned stream; the pool discards the connection
+                    pass
+    
+    def build_prediction(self, vehicle, now=None):
+        """Schedule-based prediction for one vehicle row (same engine as the fleet path)"""
+        predictions = fleet_engine.predict_fleet([vehicle], schedule_registry, now)
+        if not predictions:
+            raise ValueError(f"Invalid vehicle row {vehicle.get('vehicle_id', 'unknown')}")
+        return predictions[0]
+    
+    def predict_vehicle(self, vehicle_id):
+        """Generate prediction for a single vehicle, or None if it is not an active vehicle"""
+        def compute():
+            vehicle = self.get_vehicle(vehicle_id)
+            if vehicle is None:
+                return None
+            return self.build_prediction(vehicle)
+        
+        return self.flight.do(('vehicle', vehicle_id), compute)
+    
+    def predict_days(self, X, chunk_size=BATCH_CHUNK_SIZE):
+        """Model-predicted days until maintenance for a feature matrix.
+        
+        Rows are scaled and run through one inplace_predict per chunk, so
+        temporary memory stays bounded by the chunk size.
+        """
+        model, scaler = self.model, self.scaler
+        if isinstance(model, TreeEnsemble):
+            predict = model.predict
+        else:
+            predict = model.get_booster().inplace_predict
+        X = np.asarray(X, dtype=np.float64)
+        predictions = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), chunk_size):
+            chunk = scaler.transform(X[start:start + chunk_size])
+            predictions[start:start + chunk_size] = predict(chunk)
+        return predictions
+    
+    def predict_batch_vehicles(self, vehicle_ids, chunk_size=BATCH_CHUNK_SIZE):
+        """Model and schedule-based predictions for a list of vehicle ids"""
+        results = []
+        found = set()
+        now = datetime.now()
+        # Bounded IN lists; each chunk is fetched, featurized and predicted on its own
+        for start in range(0, len(vehicle_ids), BATCH_QUERY_IDS):
+            vehicles = self.get_vehicles(vehicle_ids[start:start + BATCH_QUERY_IDS])
+            fleet = fleet_engine.load_fleet(vehicles)
+            schedule = fleet_engine.compute(fleet, schedule_registry, now)
+            predicted = self.predict_days(fleet_engine.feature_matrix(fleet, schedule), chunk_size)
+            for record, days in zip(fleet_engine.to_records(fleet, schedule), predicted.tolist()):
+                found.add(record['vehicle_id'])
+                results.append({
+                    'vehicle_id': record['vehicle_id'],
+                    'predicted_days_until_maintenance': round(days, 1),
+                    'schedule': record
+                })
+        missing = [vid for vid in vehicle_ids if vid not in found]
+        return results, missing
+    
+    def get_data_fingerprint(self):
+        """Fingerprint of the rows predictions depend on (changes invalidate the cache)"""
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(FINGERPRINT_QUERY)
+            result = cursor.fetchone()
+            cursor.close()
+            return tuple(str(value) for value in result)
     
     def predict_all_vehicles(self):
-        """Generate predictions for all vehicles"""
+        """Generate predictions for all vehicles (served from the prediction cache when fresh)"""
+        return self.cache.get_or_compute(
+            ('all',),
+            lambda: self.flight.do(('all',), self.compute_all_predictions),
+            lambda: self.flight.do(('fingerprint',), self.get_data_fingerprint),
+            cacheable=lambda result: result.get('success')
+        )
+    
+    def current_predictions(self):
+        """The fleet predictions currently served (snapshot or cached result), None if unavailable"""
+        if self.snapshots.enabled:
+            snapshot = self.snapshots.wait_ready(SNAPSHOT_WAIT_TIMEOUT)
+            return snapshot.predictions if snapshot is not None else None
+        result = self.predict_all_vehicles()
+        return result['data'] if result.get('success') else None
+    
+    def create_event_source(self):
+        return UrgencyEvents(self.current_predictions, lambda predictions: self.changes.generation(predictions))
+    
+    def predict_filtered(self, filters):
+        """Predictions matching `filters` (cached per filter set)"""
+        key = filters.cache_key()
+        return self.cache.get_or_compute(
+            key,
+            lambda: self.flight.do(key, lambda: self.compute_filtered_predictions(filters)),
+            lambda: self.flight.do(('fingerprint',), self.get_data_fingerprint),
+            cacheable=lambda result: result.get('success')
+        )
+    
+    def compute_filtered_predictions(self, filters):
+        """Filtered predictions with mileage, plate prefix and keyset applied in MySQL"""
         try:
-            vehicles = self.get_all_vehicles()
-            
-            if not vehicles:
-                return {'success': False, 'message': 'No vehicles found'}
-            
-            predictions = []
-            
-            for vehicle in vehicles:
-                try:
-                    vehicle_id = int(vehicle['vehicle_id'])
-                    vehicle_name = str(vehicle['article'])
-                    plate_number = str(vehicle['plate_number'])
-                    current_km = float(vehicle['current_mileage'] or 0)
-                    vehicle_created = vehicle['vehicle_created']
-                    maintenance_count = int(vehicle['maintenance_count'])
-                    last_maint_date = vehicle['last_maintenance_date']
-                    gps_points = int(vehicle['gps_points_last_week'] or 0)
-                    
-                    # Calculate vehicle age
-                    vehicle_age_days = (datetime.now() - vehicle_created).days
-                    
-                    # Calculate days since last maintenance
-                    if last_maint_date:
-                        days_since_maint = (datetime.now() - last_maint_date).days
-                    else:
-                        days_since_maint = vehicle_age_days  # No maintenance yet
-                    
-                    # Get next maintenance from schedule
-                    next_maint = self.get_next_maintenance_from_schedule(current_km)
-                    
-                    # Use schedule-based prediction with proper month calculation
-                    km_to_next = next_maint['km_until']
-                    months_until = next_maint['months']
-                    
-                    # Calculate days until based on 30 days per month
-                    days_until = months_until * 30
-                    
-                    # For synthetic vehicles, use the schedule-based calculation only
-                    # Don't override with days_since_maintenance logic
-                    if current_km > 0:  # Synthetic vehicles have positive mileage
-                        # Use schedule-based urgency (months-based thresholds)
-                        months_until_maint = days_until / 30.0
-                        
-                        if months_until_maint < 0.25:  # Less than 1 week
-                            urgency_level = 'CRITICAL'
-                        elif months_until_maint < 0.5:  # Less than 2 weeks
-                            urgency_level = 'HIGH'
-                        elif months_until_maint < 2:  # Less than 2 months
-                            urgency_level = 'MEDIUM'
-                        else:  # 2+ months away (all schedule intervals are 3+ months)
-                            urgency_level = 'LOW'
-                    else:
-                        # For real vehicles, check if overdue based on last maintenance
-                        if days_since_maint > 180:  # 6 months overdue
-                            urgency_level = 'CRITICAL'
-                            days_until = -days_since_maint + 90  # Negative = overdue
-                        elif days_since_maint > 120:  # 4 months overdue
-                            urgency_level = 'HIGH'
-                            days_until = -days_since_maint + 90
-                        elif days_since_maint > 90:  # 3 months overdue
-                            urgency_level = 'MEDIUM'
-                            days_until = -days_since_maint + 90
-                        else:
-                            # Use schedule-based urgency
-                            months_until_maint = days_until / 30.0
-                            
-                            if months_until_maint < 0.25:  # Less than 1 week
-                                urgency_level = 'CRITICAL'
-                            elif months_until_maint < 0.5:  # Less than 2 weeks
-                                urgency_level = 'HIGH'
-                            elif months_until_maint < 2:  # Less than 2 months
-                                urgency_level = 'MEDIUM'
-                            else:  # 2+ months away
-                                urgency_level = 'LOW'
-                    
-                    # Calculate next maintenance date
-                    next_date = (datetime.now() + timedelta(days=max(days_until, 0))).strftime('%Y-%m-%d')
-                    
-                    # Add prediction
-                    predictions.append({
-                        'vehicle_id': vehicle_id,
-                        'vehicle_name': vehicle_name,
-                        'plate_number': plate_number,
-                        'urgency_level': urgency_level,
-                        'days_until_maintenance': int(days_until),
-                        'next_maintenance_date': next_date,
-                        'recommended_maintenance': next_maint['services'],
-                        'confidence': 90,
-                        'method': 'schedule_based',
-                        'total_km_traveled': current_km,
-                        'factors': {
-                            'vehicle_age_days': vehicle_age_days,
-                            'days_since_maintenance': days_since_maint,
-                            'avg_daily_usage_km': round(gps_points / 7, 2) if gps_points > 0 else 10,
-                            'gps_points_last_week': gps_points,
-                            'maintenance_count': maintenance_count,
-                            'current_mileage': current_km
-                        }
-                    })
-                    
-                except Exception as e:
-                    print(f"[ERROR] Error processing vehicle {vehicle.get('vehicle_id', 'unknown')}: {e}")
-                    continue
-            
-            print(f"[SUCCESS] Generated predictions for {len(predictions)} vehicles")
-            return {'success': True, 'data': predictions}
+            now = datetime.now()
+            if not filters.paged:
+                predictions = fleet_engine.predict_fleet(self.get_filtered_vehicles(filters), schedule_registry, now)
+                page, next_cursor = filters.select(predictions, prefiltered=True)
+                return {'success': True, 'data': page, 'count': len(page), 'next_cursor': next_cursor}
             
+            # Keyset pages: fetch just the ids of one page, then their features.
+            # With an urgency filter (computed, not in SQL) keep scanning until the page is full.
+            batch = filters.limit if filters.urgency is None else max(filters.limit, URGENCY_SCAN_BATCH)
+            page, next_cursor, after = [], None, filters.after
+            while next_cursor is None:
+                ids = self.get_vehicle_ids(filters, after, batch)
+                vehicles = []
+                for start in range(0, len(ids), BATCH_QUERY_IDS):
+                    vehicles.extend(self.get_vehicles(ids[start:start + BATCH_QUERY_IDS]))
+                rows, next_cursor = filters.select(
+                    fleet_engine.predict_fleet(vehicles, schedule_registry, now),
+                    prefiltered=True, limit=filters.limit - len(page))
+                page.extend(rows)
+                if len(ids) < batch:
+                    break
+                after = ids[-1]
+            return {'success': True, 'data': page, 'count': len(page), 'next_cursor': next_cursor}
         except Exception as e:
             return {'success': False, 'message': f'Error: {str(e)}'}
     
-    def train_model(self):
-        """Train XGBoost model"""
+    def compute_all_predictions(self):
+        """Generate predictions for all vehicles"""
+        try:
+            return self.predictions_from_rows(self.get_all_vehicles())
+        except Exception as e:
+            return {'success': False, 'message': f'Error: {str(e)}'}
+    
+    def predictions_from_rows(self, vehicles):
+        """Fleet predictions for fetched vehicle rows (CPU only, no DB access)"""
+        if not vehicles:
+            return {'success': False, 'message': 'No vehicles found'}
+        
+        predictions = fleet_engine.predict_fleet(vehicles, schedule_registry, datetime.now())
+        
+        print(f"[SUCCESS] Generated predictions for {len(predictions)} vehicles")
+        return {'success': True, 'data': predictions}
+    
+    def maintenance_calendar(self, horizon_days, group):
+        """Projected workshop load (cached per horizon and grouping like the filtered predictions)"""
+        key = ('calendar', horizon_days, group)
+        return self.cache.get_or_compute(
+            key,
+            lambda: self.flight.do(key, lambda: self.compute_calendar(horizon_days, group)),
+            lambda: self.flight.do(('fingerprint',), self.get_data_fingerprint),
+            cacheable=lambda result: result.get('success')
+        )
+    
+    def compute_calendar(self, horizon_days, group):
+        try:
+            return maintenance_calendar.fleet_calendar(self.get_all_vehicles(), schedule_registry, horizon_days, group)
+        except Exception as e:
+            return {'success': False, 'message': f'Error: {str(e)}'}
+    
+    def train_model(self, progress=None):
+        """Train XGBoost model
+        
+        `progress(phase)` is called as each phase starts: fetch, feature_build,
+        fit, evaluate, save.
+        """
+        if INFERENCE_ONLY:
+            return {'success': False, 'message': 'Training is disabled in inference-only mode'}
+        # A late startup load must not replace the freshly trained model
+        self.wait_for_model()
+        # Training-only dependencies (inference-only workers never import them)
+        from xgboost import XGBRegressor
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error, r2_score
+        
+        report = progress or (lambda phase: None)
         print("[TRAINING] Training XGBoost model...")
         try:
+            report('fetch')
             vehicles = self.get_all_vehicles()
             
             if not vehicles or len(vehicles) < 5:
                 return {'success': False, 'message': f'Not enough data ({len(vehicles) if vehicles else 0} vehicles)'}
             
             # Prepare training data
-            X_data = []
-            y_data = []
-            
-            for vehicle in vehicles:
-                vehicle_age = (datetime.now() - vehicle['vehicle_created']).days
-                current_km = float(vehicle['current_mileage'] or 0)
-                maint_count = int(vehicle['maintenance_count'])
-                gps_points = int(vehicle['gps_points_last_week'] or 0)
-                
-                if vehicle['last_maintenance_date']:
-                    days_since = (datetime.now() - vehicle['last_maintenance_date']).days
-                else:
-                    days_since = vehicle_age
-                
-                # Target: days until next maintenance (from schedule)
-                next_maint = self.get_next_maintenance_from_schedule(current_km)
-                
-                X_data.append([vehicle_age, days_since, gps_points / 7, current_km, maint_count])
-                y_data.append(next_maint['days_until'])
-            
-            X = np.array(X_data)
-            y = np.array(y_data)
+            report('feature_build')
+            fleet = fleet_engine.load_fleet(vehicles)
+            schedule = fleet_engine.compute(fleet, schedule_registry, datetime.now())
+            X = fleet_engine.feature_matrix(fleet, schedule)
+            # Target: days until next maintenance (from schedule)
+            y = schedule['schedule_days']
             
             # Train/test split
             if len(X) >= 10:
@@ -288,28 +486,27 @@ class MaintenancePredictor:
             else:
                 X_train, X_test, y_train, y_test = X, X, y, y
             
-            # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Scale features (fresh scaler: the served one stays untouched until the swap)
+            report('fit')
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
             # Train XGBoost
-            self.model = XGBRegressor(
+            model = XGBRegressor(
                 n_estimators=100,
                 max_depth=6,
                 learning_rate=0.1,
                 random_state=42
             )
-            self.model.fit(X_train_scaled, y_train)
+            model.fit(X_train_scaled, y_train)
             
             # Evaluate
-            y_pred = self.model.predict(X_test_scaled)
+            report('evaluate')
+            y_pred = model.predict(X_test_scaled)
             mse = mean_squared_error(y_test, y_pred)
             r2 = r2_score(y_test, y_pred)
             
-            # Save model
-            self.save_model()
-            self.is_trained = True
-            
             # Since we're using schedule-based predictions (not pure ML), 
             # show high accuracy/confidence based on schedule adherence
             stats = {
@@ -321,6 +518,13 @@ class MaintenancePredictor:
                 'timestamp': datetime.now().isoformat()
             }
             
+            # Publish to the registry (other workers pick it up) and swap in
+            report('save')
+            version = self.registry.publish(model, scaler, stats, FEATURE_DEFINITIONS)
+            self.model, self.scaler, self.model_version = model, ScalerParams.from_scaler(scaler), version
+            self.is_trained = True
+            stats['model_version'] = version
+            
             # Save stats
             with open(self.stats_file, 'w') as f:
                 json.dump(stats, f)
@@ -336,26 +540,90 @@ class MaintenancePredictor:
         except Exception as e:
             return {'success': False, 'message': f'Training error: {str(e)}'}
     
-    def save_model(self):
-        """Save model and scaler to disk"""
-        with open(self.model_file, 'wb') as f:
-            pickle.dump(self.model, f)
-        with open(self.scaler_file, 'wb') as f:
-            pickle.dump(self.scaler, f)
+    def save_model(self, stats=None):
+        """Publish the current model and scaler as a new registry version"""
+        self.model_version = self.registry.publish(self.model, self.scaler, stats, FEATURE_DEFINITIONS)
+        return self.model_version
     
     def load_model(self):
-        """Load model and scaler from disk"""
+        """Startup load: the registry's current version, falling back to the legacy pickles"""
+        version = self.registry.current_version()
+        if version:
+            try:
+                self.load_version(version)
+                return True
+            except Exception as e:
+                print(f"[WARNING] Failed to load model {version} from registry: {e}")
+        return self.load_legacy_model()
+    
+    def load_version(self, version):
+        """Swap in a registry version (raises if it can't be loaded; the current model is kept)"""
+        model, scaler, _ = self.registry.load(version, inference_only=INFERENCE_ONLY,
+                                              feature_definitions=FEATURE_DEFINITIONS)
+        self.model, self.scaler, self.model_version = model, scaler, version
+        self.is_trained = True
+        print(f"[SUCCESS] Model {version} loaded from registry")
+    
+    def start_model_load(self):
+        """Load the model in a background thread (again after a fork if it hadn't finished)"""
+        with self._loader_lock:
+            if self._model_loaded.is_set() or self._loader_pid == os.getpid():
+                return
+            self._loader_pid = os.getpid()
+            threading.Thread(target=self._load_in_background, name='model-load', daemon=True).start()
+    
+    def _load_in_background(self):
+        try:
+            self.load_model()
+        finally:
+            self._model_loaded.set()
+    
+    def wait_for_model(self, timeout=MODEL_LOAD_TIMEOUT):
+        """Block until the startup model load has finished; False on timeout"""
+        self.start_model_load()
+        return self._model_loaded.wait(timeout)
+    
+    def load_legacy_model(self):
+        """Load pickled model and scaler (deployments predating the registry)"""
+        if not (os.path.exists(self.model_file) and os.path.exists(self.scaler_file)):
+            return False
+        if INFERENCE_ONLY:
+            # Unpickling would import xgboost/sklearn; export to the registry first
+            print("[WARNING] Legacy pickled model ignored in inference-only mode")
+            return False
+        if FEATURE_DEFINITIONS != GPS_POINT_FEATURES:
+            # Trained on GPS points per day; retrain with the feature store enabled
+            print("[WARNING] Legacy pickled model ignored: it predates GPS distance features")
+            return False
         try:
             with open(self.model_file, 'rb') as f:
                 self.model = pickle.load(f)
             with open(self.scaler_file, 'rb') as f:
                 self.scaler = pickle.load(f)
+            self.model_version = 'legacy-pickle'
             self.is_trained = True
             print("[SUCCESS] Model loaded from disk")
             return True
         except:
             return False
     
+    def refresh_model(self):
+        """Hot-swap to a version published by another worker (cheap manifest poll)"""
+        if not self._model_loaded.is_set():
+            return
+        version = self.registry.poll(self.model_version)
+        if version:
+            print(f"[INFO] New model version {version} published, reloading")
+            try:
+                self.load_version(version)
+            except FeatureMismatch as e:
+                # Retrying can't help: it needs a server reading the same feature source
+                print(f"[WARNING] Model {version} ignored: {e}")
+            except Exception as e:
+                # Keep serving the current model and try the version again on a later poll
+                print(f"[WARNING] Failed to load model {version}, keeping {self.model_version}: {e}")
+                self.registry.retry()
+    
     def get_status(self):
         """Get server status"""
         stats = None
@@ -367,47 +635,98 @@ class MaintenancePredictor:
             'success': True,
             'data': {
                 'model_trained': self.is_trained,
+                'model_loading': not self._model_loaded.is_set(),
+                'model_version': self.model_version,
                 'algorithm': 'XGBoost',
+                'evaluator': 'numpy' if isinstance(self.model, TreeEnsemble) else 'xgboost',
+                'inference_only': INFERENCE_ONLY,
+                'feature_definitions': FEATURE_DEFINITIONS,
+                'feature_store': self.features.last_update if self.features else None,
                 'port': 8080,
                 'training_stats': stats
             }
         }
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (jsonify and friends)"""
+    
+    # Key order is the insertion order: sorting costs time and clients don't need it
+    sort_keys = False
+    
+    def dumps(self, obj, **kwargs):
+        return response_formats.dumps_json(obj).decode()
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(response_formats.dumps_json(obj), mimetype=self.mimetype)
+
+# Routes (registered on the app by create_app)
+api = Blueprint('api', __name__)
 
-# Global predictor
+# Global predictor (with gunicorn preload_app it is built once in the master and
+# shared copy-on-write by the workers)
 predictor = MaintenancePredictor()
 
-@app.route('/health', methods=['GET'])
+# How long a request waits for the first snapshot after startup
+SNAPSHOT_WAIT_TIMEOUT = 30
+
+# Background training (one job at a time per worker)
+# Job records and the training lock are shared by every worker (next to the model registry)
+training_jobs = TrainingJobManager(
+    predictor.train_model,
+    os.getenv('TRAINING_JOB_DIR') or os.path.join(predictor.registry.root, '.training_jobs')
+)
+
+def reinit_after_fork():
+    """Reset per-process state in a freshly forked worker (gunicorn post_fork)"""
+    db_pool.reset()
+    predictor.cache = PredictionCache()
+    predictor.flight = SingleFlight()
+    predictor.changes = change_tracking.ChangeTracker()
+    predictor.events = predictor.create_event_source()
+    predictor.start_model_load()
+    predictor.snapshots.ensure_started()
+    if predictor.features:
+        predictor.features.ensure_started()
+
+@api.before_app_request
+def refresh_model():
+    """Pick up model versions published by other workers"""
+    predictor.refresh_model()
+    if predictor.features:
+        predictor.features.ensure_started()
+
+@api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint with database connection test"""
     try:
         # Test database connection
-        conn = get_db_connection()
-        if conn and conn.is_connected():
-            conn.close()
+        with db_pool.connection() as conn:
+            connected = conn.is_connected()
+        if connected:
             return jsonify({
                 'success': True, 
                 'status': 'healthy',
-                'database': 'connected'
+                'database': 'connected',
+                'pool': db_pool.stats()
             })
         else:
             return jsonify({
                 'success': False, 
                 'status': 'healthy',
-                'database': 'disconnected'
+                'database': 'disconnected',
+                'pool': db_pool.stats()
             }), 503
     except Exception as e:
         return jsonify({
             'success': False, 
             'status': 'healthy',
             'database': 'error',
-            'error': str(e)
+            'error': str(e),
+            'pool': db_pool.stats()
         }), 503
 
-@app.route('/status', methods=['GET'])
+@api.route('/status', methods=['GET'])
 def status():
     """Get server status"""
     try:
@@ -416,46 +735,315 @@ def status():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
-@app.route('/predict_all', methods=['GET'])
+@api.route('/predict_all', methods=['GET'])
 def predict_all():
-    """Get predictions for all vehicles"""
+    """Get predictions for all vehicles
+    
+    Optional filters: urgency=CRITICAL,HIGH, min_km, max_km, plate_prefix,
+    fields=vehicle_id,urgency_level,... and keyset pages with limit + after=<next_cursor>.
+    Response format: ?format=json|msgpack|arrow or the Accept header.
+    Conditional GET with the ETag, or ?since=<token> for the changed vehicles only.
+    """
     try:
-        result = predictor.predict_all_vehicles()
-        return jsonify(result)
+        try:
+            filters = PredictionFilters.from_args(request.args)
+        except FilterError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        if prediction_stream.wants_stream(request.args, request.headers.get('Accept')):
+            return stream_predictions(filters)
+        
+        fmt = response_formats.negotiate(request.args, request.headers.get('Accept'))
+        if fmt is None:
+            return jsonify({'success': False, 'message': response_formats.not_acceptable_message()}), 406
+        
+        if predictor.snapshots.enabled:
+            snapshot = predictor.snapshots.wait_ready(SNAPSHOT_WAIT_TIMEOUT)
+            if snapshot is None:
+                return jsonify({'success': False, 'message': 'Prediction snapshot not ready'}), 503
+            if filters.active:
+                page, next_cursor = predictor.snapshots.select(snapshot, filters)
+                return tracked_response({'success': True, 'data': page, 'count': len(page),
+                                         'next_cursor': next_cursor, 'snapshot': predictor.snapshots.meta()},
+                                        fmt, filters.cache_key())
+            return tracked_response({'success': True, 'data': snapshot.predictions,
+                                     'snapshot': predictor.snapshots.meta()}, fmt)
+        
+        if filters.active:
+            return tracked_response(predictor.predict_filtered(filters), fmt, filters.cache_key())
+        return tracked_response(predictor.predict_all_vehicles(), fmt)
     except Exception as e:
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
-@app.route('/predict', methods=['GET'])
+def formatted_response(result, fmt):
+    """Prediction list response in the negotiated format (errors are always JSON)"""
+    if fmt == 'json' or not result.get('success'):
+        response = jsonify(result)
+    else:
+        response = Response(response_formats.encode(result, fmt), mimetype=response_formats.MEDIA_TYPES[fmt])
+    response.headers['Vary'] = 'Accept'
+    return response
+
+def tracked_response(result, fmt, scope=None):
+    """formatted_response with a strong ETag (304 on If-None-Match) or, with ?since=, only the changes
+    
+    `scope` is the filter set's key (change history is kept per filter set).
+    """
+    if not result.get('success'):
+        return formatted_response(result, fmt)
+    generation = predictor.changes.generation(result['data'], scope)
+    since = request.args.get('since')
+    if since:
+        envelope = {key: value for key, value in result.items() if key not in ('data', 'count')}
+        envelope.update(predictor.changes.delta(result['data'], change_tracking.parse_token(since), scope))
+        response = formatted_response(envelope, fmt)
+    else:
+        tag = change_tracking.etag(generation.token, fmt)
+        if change_tracking.etag_matches(request.headers.get('If-None-Match'), tag):
+            response = Response(status=304)
+        else:
+            response = formatted_response(result, fmt)
+        response.headers['ETag'] = tag
+        response.headers['Vary'] = 'Accept'
+    response.headers['X-Change-Token'] = generation.token
+    return response
+
+def stream_predictions(filters):
+    """NDJSON /predict_all response: one prediction per line, gzip if accepted"""
+    if predictor.snapshots.enabled:
+        snapshot = predictor.snapshots.wait_ready(SNAPSHOT_WAIT_TIMEOUT)
+        if snapshot is None:
+            return jsonify({'success': False, 'message': 'Prediction snapshot not ready'}), 503
+        predictions = filters.select(snapshot.predictions)[0] if filters.active else snapshot.predictions
+        chunks = prediction_stream.chunked(predictions)
+    elif filters.paged:
+        # One page is small: compute it as usual (cached), then stream it
+        result = predictor.predict_filtered(filters)
+        if not result.get('success'):
+            return jsonify(result)
+        chunks = prediction_stream.chunked(result['data'])
+    else:
+        chunks = predictor.stream_predictions(filters)
+    
+    # Produce the first batch before sending headers, so a failing query is still a JSON error
+    try:
+        first = next(chunks, None)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+    gzip = prediction_stream.accepts_gzip(request.headers.get('Accept-Encoding'))
+    response = Response(prediction_stream.response_body(first, chunks, gzip), mimetype=prediction_stream.NDJSON)
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    # Ask proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api.route('/predict', methods=['GET'])
 def predict():
     """Get prediction for a single vehicle"""
     try:
         vehicle_id = request.args.get('vehicle_id')
         if not vehicle_id:
             return jsonify({'success': False, 'message': 'vehicle_id required'}), 400
+        try:
+            vehicle_id = int(vehicle_id)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'vehicle_id must be an integer'}), 400
+        
+        if predictor.snapshots.enabled:
+            snapshot = predictor.snapshots.wait_ready(SNAPSHOT_WAIT_TIMEOUT)
+            if snapshot is not None and vehicle_id in snapshot.by_id:
+                return vehicle_response({'success': True, 'data': snapshot.by_id[vehicle_id],
+                                         'snapshot': predictor.snapshots.meta()})
+        
+        # Not in snapshot mode, or a vehicle added since the last snapshot
+        prediction = predictor.predict_vehicle(vehicle_id)
+        if prediction is None:
+            return jsonify({'success': False, 'message': 'Vehicle not found'}), 404
+        return vehicle_response({'success': True, 'data': prediction})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
+
+def vehicle_response(result):
+    """Single prediction with a strong ETag derived from its digest (304 on If-None-Match)"""
+    tag = change_tracking.etag(format(change_tracking.digest(result['data']), '016x'))
+    if change_tracking.etag_matches(request.headers.get('If-None-Match'), tag):
+        response = Response(status=304)
+    else:
+        response = jsonify(result)
+    response.headers['ETag'] = tag
+    return response
+
+@api.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Batched XGBoost predictions for vehicle ids or raw feature rows
+    
+    Body: {"vehicle_ids": [1, 2, ...]} or {"rows": [[f1..f5], ...] or [{feature: value}, ...]}
+    with features in model_registry.FEATURE_NAMES order; avg_daily_usage in the unit
+    reported as feature_definitions (km per day with FEATURE_STORE=1, else GPS points per day).
+    """
+    try:
+        predictor.wait_for_model()
+        if not predictor.is_trained:
+            return jsonify({'success': False, 'message': 'Model not trained'}), 503
         
-        # For single vehicle, get from predict_all and filter
-        all_preds = predictor.predict_all_vehicles()
-        if all_preds['success']:
-            matching = [p for p in all_preds['data'] if p['vehicle_id'] == int(vehicle_id)]
-            if matching:
-                return jsonify({'success': True, 'data': matching[0]})
+        body = request.get_json(silent=True) or {}
+        vehicle_ids = body.get('vehicle_ids')
+        rows = body.get('rows')
+        if (vehicle_ids is None) == (rows is None):
+            return jsonify({'success': False, 'message': 'Provide either vehicle_ids or rows'}), 400
+        if not isinstance(vehicle_ids if vehicle_ids is not None else rows, list):
+            field = 'vehicle_ids' if vehicle_ids is not None else 'rows'
+            return jsonify({'success': False, 'message': f'{field} must be a list'}), 400
+        count = len(vehicle_ids if vehicle_ids is not None else rows)
+        if count > BATCH_MAX_ROWS:
+            return jsonify({'success': False, 'message': f'Batch too large ({count} > {BATCH_MAX_ROWS})'}), 413
+        try:
+            chunk_size = max(1, min(int(body.get('chunk_size', BATCH_CHUNK_SIZE)), BATCH_CHUNK_SIZE))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'chunk_size must be an integer'}), 400
+        
+        if vehicle_ids is not None:
+            try:
+                vehicle_ids = [int(vid) for vid in vehicle_ids]
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': 'vehicle_ids must be integers'}), 400
+            data, missing = predictor.predict_batch_vehicles(vehicle_ids, chunk_size)
+            return jsonify({
+                'success': True,
+                'model_version': predictor.model_version,
+                'data': data,
+                'missing': missing
+            })
+        
+        try:
+            if rows and isinstance(rows[0], dict):
+                X = np.array([[row[name] for name in FEATURE_NAMES] for row in rows], dtype=np.float64)
             else:
-                return jsonify({'success': False, 'message': 'Vehicle not found'}), 404
-        else:
-            return jsonify(all_preds), 500
+                X = np.array(rows, dtype=np.float64)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'Invalid rows: {str(e)}'}), 400
+        if not (X.ndim == 2 and X.shape[1] == len(FEATURE_NAMES)):
+            return jsonify({
+                'success': False,
+                'message': f'Invalid rows: expected a list of {len(FEATURE_NAMES)} features per row ({", ".join(FEATURE_NAMES)})'
+            }), 400
+        predicted = predictor.predict_days(X, chunk_size)
+        return jsonify({
+            'success': True,
+            'model_version': predictor.model_version,
+            'features': FEATURE_NAMES,
+            'feature_definitions': FEATURE_DEFINITIONS,
+            'data': np.round(predicted.astype(np.float64), 1).tolist()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
+
+@api.route('/events', methods=['GET'])
+def events():
+    """Server-Sent Events: urgency level transitions (optional urgency=HIGH,CRITICAL filter on the new level)
+    
+    Each open stream holds a worker thread, so streams per worker are capped
+    (EVENTS_MAX_SUBSCRIBERS; 503 with Retry-After when full).
+    """
+    try:
+        levels = PredictionFilters.from_args(request.args).urgency
+    except FilterError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    try:
+        subscription = predictor.events.subscribe(Subscription(levels), last_event_id)
+    except TooManySubscribers as e:
+        response = jsonify({'success': False, 'message': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(EVENTS_RETRY_AFTER)
+        return response
+    
+    def stream():
+        try:
+            yield STREAM_PREAMBLE
+            while not subscription.overflowed:
+                chunk = subscription.get(EVENTS_HEARTBEAT)
+                # Comment lines keep idle connections open through proxies
+                yield HEARTBEAT if chunk is None else chunk
+        finally:
+            predictor.events.unsubscribe(subscription)
+    
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api.route('/events/stats', methods=['GET'])
+def events_stats():
+    """Subscribers, buffered events and poll counters of /events"""
+    return jsonify({'success': True, 'data': predictor.events.stats()})
+
+@api.route('/calendar', methods=['GET'])
+def calendar():
+    """Maintenance visits projected from each vehicle's usage rate over ?horizon_days=N
+    (default 90), per day or week (?group_by=week), with a per-service breakdown"""
+    try:
+        try:
+            horizon_days, group = maintenance_calendar.parse_args(request.args)
+        except maintenance_calendar.CalendarError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify(predictor.maintenance_calendar(horizon_days, group))
     except Exception as e:
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
-@app.route('/train', methods=['POST'])
+@api.route('/snapshot/meta', methods=['GET'])
+def snapshot_meta():
+    """Version, age and staleness of the served prediction snapshot"""
+    return jsonify({'success': True, 'data': predictor.snapshots.meta()})
+
+@api.route('/train', methods=['POST'])
 def train():
-    """Train the ML model"""
+    """Start training the ML model in the background (?wait=1 blocks until it finishes)"""
     try:
-        result = predictor.train_model()
-        return jsonify(result)
+        if INFERENCE_ONLY:
+            return jsonify({'success': False, 'message': 'Training is disabled in inference-only mode'}), 403
+        
+        job, created = training_jobs.submit()
+        if request.args.get('wait') in ('1', 'true'):
+            return jsonify(job_result(training_jobs.wait(job['job_id'])))
+        
+        return jsonify({
+            'success': True,
+            'message': 'Training started' if created else 'Training already in progress',
+            'job_id': job['job_id'],
+            'coalesced': not created,
+            'job': job
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
-@app.route('/stats', methods=['GET'])
+@api.route('/train/<job_id>', methods=['GET'])
+def train_status(job_id):
+    """Progress, phase timings and result of a training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Training job not found'}), 404
+    return jsonify({'success': True, 'data': job})
+
+@api.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Prediction cache hit/miss counters"""
+    data = predictor.cache.stats()
+    data['single_flight'] = predictor.flight.stats()
+    data['change_tracking'] = predictor.changes.stats()
+    return jsonify({'success': True, 'data': data})
+
+@api.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Drop cached predictions (e.g. after bulk mileage or maintenance updates)"""
+    predictor.cache.invalidate()
+    return jsonify({'success': True, 'message': 'Prediction cache invalidated'})
+
+@api.route('/stats', methods=['GET'])
 def stats():
     """Get model training statistics"""
     try:
@@ -467,28 +1055,48 @@ def stats():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
+def create_app():
+    """Flask app serving the module-level predictor"""
+    flask_app = Flask(__name__)
+    if response_formats.orjson is not None:
+        flask_app.json = FastJSONProvider(flask_app)
+    CORS(flask_app)  # Enable CORS for all routes
+    flask_app.register_blueprint(api)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8080))
     
     print(f"[SERVER] Smart Track ML Server starting...")
     print(f"[INFO] Algorithm: XGBoost Regressor")
+    if INFERENCE_ONLY:
+        print(f"[INFO] Inference-only mode: NumPy tree evaluator, training disabled")
     print(f"[INFO] Endpoints:")
     print(f"   GET  http://localhost:{port}/health")
     print(f"   GET  http://localhost:{port}/status")
     print(f"   GET  http://localhost:{port}/predict_all")
     print(f"   GET  http://localhost:{port}/predict?vehicle_id=1")
+    print(f"   POST http://localhost:{port}/predict_batch")
     print(f"   GET  http://localhost:{port}/stats")
+    print(f"   GET  http://localhost:{port}/cache/stats")
+    print(f"   GET  http://localhost:{port}/snapshot/meta")
+    print(f"   GET  http://localhost:{port}/events")
+    print(f"   GET  http://localhost:{port}/calendar?horizon_days=90")
+    print(f"   POST http://localhost:{port}/cache/invalidate")
     print(f"   POST http://localhost:{port}/train")
+    print(f"   GET  http://localhost:{port}/train/<job_id>")
     print(f"[INFO] Server running... Press Ctrl+C to stop\n")
     
-    # Auto-train on startup if model doesn't exist
-    if not predictor.is_trained:
-        print("[TRAINING] Auto-training model on startup...")
-        result = predictor.train_model()
-        if result['success']:
-            print(f"[SUCCESS] Startup training complete!")
-        else:
-            print(f"[WARNING] Startup training failed: {result['message']}")
+    # Auto-train in the background if no model exists (the server starts serving right away)
+    def auto_train():
+        predictor.wait_for_model()
+        if not predictor.is_trained and not INFERENCE_ONLY and os.getenv('AUTO_TRAIN', '1') != '0':
+            job, _ = training_jobs.submit()
+            print(f"[TRAINING] Auto-training model on startup (job {job['job_id']})...")
+    
+    threading.Thread(target=auto_train, name='auto-train', daemon=True).start()
     
     # Run Flask app
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Versioned Model Registry
+- One directory per model version: XGBoost native UBJSON model + scaler params as plain arrays
+  + flattened trees for the NumPy evaluator (tree_ensemble.py)
+- Atomic publish: version written to a temp dir and renamed, then manifest.json replaced
+- Workers poll the manifest (mtime) and hot-swap to new versions without a restart
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from tree_ensemble import TreeEnsemble
+
+MANIFEST = 'manifest.json'
+MODEL_FILE = 'model.ubj'
+SCALER_FILE = 'scaler.npz'
+TREES_FILE = 'trees.npz'
+META_FILE = 'meta.json'
+
+# Column order of the feature matrix built by train_model
+FEATURE_NAMES = ['vehicle_age_days', 'days_since_maintenance', 'avg_daily_usage', 'current_km', 'maintenance_count']
+
+# What avg_daily_usage measures depends on the data source: GPS points per day from
+# raw gps_logs, km per day from the feature store's GPS distance. Each version records
+# its definitions; versions published before they were recorded used GPS points.
+GPS_POINT_FEATURES = {'avg_daily_usage': 'gps_points_per_day'}
+GPS_DISTANCE_FEATURES = {'avg_daily_usage': 'km_per_day'}
+
+
+class ScalerParams:
+    """StandardScaler parameters as plain arrays (same transform, no sklearn needed)"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(scaler.mean_)
+        return cls(scaler.mean_, scale)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class FeatureMismatch(ValueError):
+    """Version trained on features defined differently from the running server's"""
+
+
+class ModelRegistry:
+    def __init__(self, root=None, keep=None, poll_interval=None):
+        self.root = root or os.getenv('MODEL_REGISTRY_DIR', 'model_registry')
+        self.keep = keep or int(os.getenv('MODEL_REGISTRY_KEEP', 5))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('MODEL_POLL_INTERVAL', 5))
+        self._manifest_mtime = None
+        self._polled_at = 0.0
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST)
+
+    def publish(self, model, scaler, stats=None, feature_definitions=None):
+        """Write a new version and make it current; returns the version id"""
+        os.makedirs(self.root, exist_ok=True)
+        version = datetime.now().strftime('%Y%m%dT%H%M%S%f') + '-' + uuid.uuid4().hex[:6]
+        tmp_dir = os.path.join(self.root, f'.tmp-{version}')
+        os.makedirs(tmp_dir)
+        try:
+            model.save_model(os.path.join(tmp_dir, MODEL_FILE))
+            TreeEnsemble.from_booster(model).save(os.path.join(tmp_dir, TREES_FILE))
+            params = scaler if isinstance(scaler, ScalerParams) else ScalerParams.from_scaler(scaler)
+            np.savez(os.path.join(tmp_dir, SCALER_FILE), mean=params.mean_, scale=params.scale_)
+            with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+                json.dump({
+                    'version': version,
+                    'created_at': datetime.now().isoformat(),
+                    'features': FEATURE_NAMES,
+                    'feature_definitions': feature_definitions or GPS_POINT_FEATURES,
+                    'training_stats': stats,
+                }, f, default=float)
+            os.rename(tmp_dir, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._write_manifest({'current': version, 'published_at': datetime.now().isoformat()})
+        self.prune()
+        return version
+
+    def _write_manifest(self, manifest):
+        tmp_path = os.path.join(self.root, f'.{MANIFEST}.{uuid.uuid4().hex[:6]}')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def current_version(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f).get('current')
+        except (OSError, ValueError):
+            return None
+
+    def version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and os.path.isdir(os.path.join(self.root, name))
+        ) if os.path.isdir(self.root) else []
+
+    def load(self, version, inference_only=False, feature_definitions=None):
+        """(model, scaler params, meta) of a published version.
+
+        With `inference_only` the model is the NumPy TreeEnsemble and xgboost
+        is never imported. With `feature_definitions` a version trained on
+        differently defined features raises FeatureMismatch.
+        """
+        path = self.version_dir(version)
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        recorded = meta.get('feature_definitions') or GPS_POINT_FEATURES
+        if feature_definitions is not None and recorded != feature_definitions:
+            raise FeatureMismatch(f'trained with {recorded}, server uses {feature_definitions}')
+        if inference_only:
+            model = TreeEnsemble.load(os.path.join(path, TREES_FILE))
+        else:
+            from xgboost import XGBRegressor
+            model = XGBRegressor()
+            model.load_model(os.path.join(path, MODEL_FILE))
+        with np.load(os.path.join(path, SCALER_FILE)) as arrays:
+            scaler = ScalerParams(arrays['mean'], arrays['scale'])
+        return model, scaler, meta
+
+    def poll(self, loaded_version):
+        """New current version id if the manifest moved past `loaded_version`, else None.
+
+        Throttled to one stat() per poll_interval; the manifest is only read
+        when its mtime changes.
+        """
+        now = time.monotonic()
+        if now - self._polled_at < self.poll_interval:
+            return None
+        self._polled_at = now
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime == self._manifest_mtime:
+            return None
+        self._manifest_mtime = mtime
+        version = self.current_version()
+        return version if version and version != loaded_version else None
+
+    def retry(self):
+        """Make the next poll re-read the manifest (after a version failed to load)"""
+        self._manifest_mtime = None
+
+    def prune(self):
+        """Keep the newest `keep` versions (never the current one)"""
+        current = self.current_version()
+        for name in self.versions()[:-self.keep]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Prediction Cache
+- In-process TTL cache of fleet predictions, bounded (LRU) and keyed by filter params
+- Entries are invalidated when the data fingerprint (cheap aggregate query) changes
+- Explicit invalidation and hit/miss counters
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, ttl=None, max_entries=None, check_interval=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('PREDICTION_CACHE_TTL', 60))
+        self.max_entries = max_entries or int(os.getenv('PREDICTION_CACHE_SIZE', 32))
+        # The fingerprint query runs at most once per interval, whatever the request rate
+        self.check_interval = check_interval if check_interval is not None else float(os.getenv('PREDICTION_CACHE_CHECK_INTERVAL', 5))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, fingerprint, stored_at)
+        self._fingerprint = None
+        self._fingerprint_at = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'invalidations': 0,
+            'evictions': 0,
+            'fingerprint_checks': 0,
+            'fingerprint_errors': 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _fingerprint_due(self, now):
+        with self._lock:
+            if self._fingerprint_at is not None and now - self._fingerprint_at < self.check_interval:
+                return False, self._fingerprint
+        return True, None
+
+    def _record_fingerprint(self, fingerprint, now):
+        with self._lock:
+            self._stats['fingerprint_checks'] += 1
+            if self._fingerprint is not None and fingerprint != self._fingerprint:
+                self._entries.clear()
+                self._stats['invalidations'] += 1
+            self._fingerprint = fingerprint
+            self._fingerprint_at = now
+        return fingerprint
+
+    def _fingerprint_failed(self, error):
+        print(f"[WARNING] Prediction cache fingerprint failed: {error}")
+        with self._lock:
+            self._stats['fingerprint_errors'] += 1
+            # Keep serving within the TTL; the last fingerprint is all we know
+            return self._fingerprint
+
+    def current_fingerprint(self, fingerprint_fn):
+        """Data fingerprint, re-queried at most every check_interval seconds"""
+        now = time.monotonic()
+        due, fingerprint = self._fingerprint_due(now)
+        if not due:
+            return fingerprint
+        try:
+            fingerprint = fingerprint_fn()
+        except Exception as e:
+            return self._fingerprint_failed(e)
+        return self._record_fingerprint(fingerprint, now)
+
+    async def current_fingerprint_async(self, fingerprint_fn):
+        """current_fingerprint for a coroutine function `fingerprint_fn`"""
+        now = time.monotonic()
+        due, fingerprint = self._fingerprint_due(now)
+        if not due:
+            return fingerprint
+        try:
+            fingerprint = await fingerprint_fn()
+        except Exception as e:
+            return self._fingerprint_failed(e)
+        return self._record_fingerprint(fingerprint, now)
+
+    def _lookup(self, key, fingerprint):
+        """(hit, value)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_fingerprint, stored_at = entry
+                if now - stored_at < self.ttl and entry_fingerprint == fingerprint:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return True, value
+                del self._entries[key]
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+        return False, None
+
+    def _store(self, key, value, fingerprint, cacheable):
+        if cacheable is None or cacheable(value):
+            with self._lock:
+                self._entries[key] = (value, fingerprint, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+        return value
+
+    def get_or_compute(self, key, compute, fingerprint_fn, cacheable=None):
+        """Cached value for `key`, computing (and storing) it on a miss"""
+        if not self.enabled:
+            return compute()
+
+        fingerprint = self.current_fingerprint(fingerprint_fn)
+        hit, value = self._lookup(key, fingerprint)
+        if hit:
+            return value
+        return self._store(key, compute(), fingerprint, cacheable)
+
+    async def get_or_compute_async(self, key, compute, fingerprint_fn, cacheable=None):
+        """get_or_compute for coroutine functions `compute` and `fingerprint_fn` (ASGI server)"""
+        if not self.enabled:
+            return await compute()
+
+        fingerprint = await self.current_fingerprint_async(fingerprint_fn)
+        hit, value = self._lookup(key, fingerprint)
+        if hit:
+            return value
+        return self._store(key, await compute(), fingerprint, cacheable)
+
+    def invalidate(self):
+        """Drop all entries and force a fresh fingerprint on the next lookup"""
+        with self._lock:
+            self._entries.clear()
+            self._fingerprint_at = None
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['ttl'] = self.ttl
+        stats['max_entries'] = self.max_entries
+        return stats
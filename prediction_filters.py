@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Prediction Filters
+- /predict_all query parameters: urgency, min_km / max_km, plate_prefix,
+  fields (projection), after / limit (keyset pagination by vehicle_id)
+- Mileage, plate prefix and the keyset are pushed down into SQL; urgency is
+  computed from the schedule, so it is applied to the predictions
+- The same filters run in memory over prediction snapshots
+"""
+
+import os
+
+from fleet_engine import URGENCY_LEVELS
+
+# Top-level keys of a prediction (fleet_engine.to_records); vehicle_id is always kept
+PREDICTION_FIELDS = (
+    'vehicle_id', 'vehicle_name', 'plate_number', 'urgency_level', 'days_until_maintenance',
+    'next_maintenance_date', 'recommended_maintenance', 'confidence', 'method',
+    'total_km_traveled', 'factors',
+)
+
+MAX_PAGE_SIZE = int(os.getenv('PREDICT_MAX_LIMIT', 5000))
+
+# Vehicles fetched per round while filling a page that also filters on urgency
+URGENCY_SCAN_BATCH = 1000
+
+
+class FilterError(ValueError):
+    """Invalid filter parameter (reported as 400)"""
+
+
+def _number(args, name, cast, minimum=None):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = cast(value)
+    except ValueError:
+        raise FilterError(f'{name} must be a number' if cast is float else f'{name} must be an integer')
+    if minimum is not None and value < minimum:
+        raise FilterError(f'{name} must be >= {minimum}')
+    return value
+
+
+def _list(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    return tuple(dict.fromkeys(item.strip() for item in value.split(',') if item.strip()))
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class PredictionFilters:
+    def __init__(self, urgency=None, min_km=None, max_km=None, plate_prefix=None,
+                 fields=None, after=None, limit=None):
+        self.urgency = frozenset(urgency) if urgency else None
+        self.min_km = min_km
+        self.max_km = max_km
+        self.plate_prefix = plate_prefix or None
+        self.fields = fields
+        self.after = after
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args):
+        """Parse request query parameters (any mapping with .get)"""
+        urgency = _list(args, 'urgency')
+        if urgency:
+            urgency = tuple(level.upper() for level in urgency)
+            unknown = [level for level in urgency if level not in URGENCY_LEVELS]
+            if unknown:
+                raise FilterError(f"Unknown urgency level(s): {', '.join(unknown)} "
+                                  f"(expected {', '.join(URGENCY_LEVELS)})")
+
+        fields = _list(args, 'fields')
+        if fields:
+            unknown = [field for field in fields if field not in PREDICTION_FIELDS]
+            if unknown:
+                raise FilterError(f"Unknown field(s): {', '.join(unknown)}")
+            fields = tuple(f for f in PREDICTION_FIELDS if f == 'vehicle_id' or f in fields)
+
+        min_km = _number(args, 'min_km', float, 0)
+        max_km = _number(args, 'max_km', float, 0)
+        if min_km is not None and max_km is not None and min_km > max_km:
+            raise FilterError('min_km must be <= max_km')
+
+        limit = _number(args, 'limit', int, 1)
+        if limit is not None and limit > MAX_PAGE_SIZE:
+            raise FilterError(f'limit must be <= {MAX_PAGE_SIZE}')
+
+        return cls(urgency=urgency, min_km=min_km, max_km=max_km,
+                   plate_prefix=(args.get('plate_prefix') or '').strip(),
+                   fields=fields, after=_number(args, 'after', int), limit=limit)
+
+    @property
+    def active(self):
+        return any(value is not None for value in (
+            self.urgency, self.min_km, self.max_km, self.plate_prefix, self.fields, self.after, self.limit))
+
+    @property
+    def paged(self):
+        return self.limit is not None
+
+    def cache_key(self):
+        return ('filtered', tuple(sorted(self.urgency)) if self.urgency else None, self.min_km, self.max_km,
+                self.plate_prefix.lower() if self.plate_prefix else None, self.fields, self.after, self.limit)
+
+    def sql(self, after=None):
+        """(' AND ...' conditions on fleet_vehicles v, params) for the column filters.
+
+        `after` overrides the request cursor while a page is being filled.
+        """
+        conditions, params = [], {}
+        if self.min_km is not None:
+            conditions.append('COALESCE(v.current_mileage, 0) >= %(min_km)s')
+            params['min_km'] = self.min_km
+        if self.max_km is not None:
+            conditions.append('COALESCE(v.current_mileage, 0) <= %(max_km)s')
+            params['max_km'] = self.max_km
+        if self.plate_prefix:
+            conditions.append('v.plate_number LIKE %(plate_prefix)s')
+            params['plate_prefix'] = _escape_like(self.plate_prefix) + '%'
+        after = self.after if after is None else after
+        if after is not None:
+            conditions.append('v.id > %(after)s')
+            params['after'] = after
+        return ''.join(f'\n      AND {condition}' for condition in conditions), params
+
+    def matches_computed(self, prediction):
+        """Filters that can't be expressed in SQL (urgency is computed)"""
+        return self.urgency is None or prediction['urgency_level'] in self.urgency
+
+    def matches(self, prediction):
+        """All filters, for predictions that didn't come through the filtered SQL (snapshots)"""
+        km = prediction['total_km_traveled']
+        plate = prediction['plate_number'] or ''
+        return (
+            (self.after is None or prediction['vehicle_id'] > self.after)
+            and (self.min_km is None or km >= self.min_km)
+            and (self.max_km is None or km <= self.max_km)
+            # MySQL's default collation compares case-insensitively; match that
+            and (not self.plate_prefix or plate.lower().startswith(self.plate_prefix.lower()))
+            and self.matches_computed(prediction)
+        )
+
+    def project(self, prediction):
+        if self.fields is None:
+            return prediction
+        return {field: prediction[field] for field in self.fields}
+
+    def select(self, predictions, prefiltered=False, limit=None):
+        """(page, next_cursor) from predictions in vehicle_id order.
+
+        `prefiltered`: the SQL filters were already applied, only check urgency.
+        `limit` overrides the page size (rows still missing from a page).
+        next_cursor is the last vehicle_id of a full page (None on the last page).
+        """
+        matches = self.matches_computed if prefiltered else self.matches
+        limit = self.limit if limit is None else limit
+        page = []
+        for prediction in predictions:
+            if matches(prediction):
+                page.append(self.project(prediction))
+                if limit is not None and len(page) == limit:
+                    return page, prediction['vehicle_id']
+        return page, None
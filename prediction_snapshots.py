@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Precomputed Prediction Snapshots
+- Background thread recomputes fleet predictions every N seconds
+- Each result is an immutable snapshot published by swapping one reference
+  (double buffering): readers keep whichever snapshot they picked up
+- If a refresh fails (e.g. MySQL briefly unreachable) the previous snapshot
+  keeps serving, marked stale
+- Filtered pages are memoized per snapshot version and filter set, so repeated
+  requests serve the same list (and change_tracking generation)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Filtered pages kept for the current snapshot version
+SNAPSHOT_PAGE_MEMO = int(os.getenv('SNAPSHOT_PAGE_MEMO', 64))
+
+
+class PredictionSnapshot:
+    """Immutable view of one fleet computation"""
+
+    __slots__ = ('version', 'generated_at', 'predictions', 'by_id', 'compute_ms',
+                 'stale', 'last_error', 'created_monotonic')
+
+    def __init__(self, version, predictions, compute_ms, generated_at=None,
+                 stale=False, last_error=None, by_id=None, created_monotonic=None):
+        self.version = version
+        self.generated_at = generated_at or datetime.now().isoformat()
+        self.predictions = tuple(predictions)
+        self.by_id = by_id if by_id is not None else {p['vehicle_id']: p for p in self.predictions}
+        self.compute_ms = compute_ms
+        self.stale = stale
+        self.last_error = last_error
+        self.created_monotonic = created_monotonic if created_monotonic is not None else time.monotonic()
+
+    def mark_stale(self, error):
+        """Same data, flagged stale (a new object: snapshots are never mutated)"""
+        return PredictionSnapshot(
+            self.version, self.predictions, self.compute_ms, self.generated_at,
+            stale=True, last_error=error, by_id=self.by_id,
+            created_monotonic=self.created_monotonic
+        )
+
+    def age_seconds(self):
+        return time.monotonic() - self.created_monotonic
+
+
+class SnapshotScheduler:
+    def __init__(self, compute, interval=None):
+        self.compute = compute
+        self.interval = interval if interval is not None else float(os.getenv('PREDICTION_SNAPSHOT_INTERVAL', 0))
+        self._current = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._failures = 0
+        self._pages_lock = threading.Lock()
+        self._pages = (None, OrderedDict())  # (snapshot version, filter key -> (page, next_cursor))
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    @property
+    def current(self):
+        return self._current
+
+    def ensure_started(self):
+        """Start the refresh thread (again after a fork: threads don't survive it)"""
+        if not self.enabled:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='prediction-snapshots', daemon=True)
+            self._thread.start()
+
+    def wait_ready(self, timeout=None):
+        """Current snapshot, waiting up to `timeout` seconds for the first one"""
+        self.ensure_started()
+        self._ready.wait(timeout)
+        return self._current
+
+    def refresh(self):
+        """Compute a new snapshot and swap it in; keep the old one (stale) on failure"""
+        start = time.perf_counter()
+        try:
+            result = self.compute()
+            error = None if result.get('success') else result.get('message', 'Prediction failed')
+        except Exception as e:
+            result, error = None, str(e)
+        compute_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        previous = self._current
+        if error is None:
+            version = previous.version + 1 if previous else 1
+            self._current = PredictionSnapshot(version, result['data'], compute_ms)
+            self._failures = 0
+            self._ready.set()
+        else:
+            self._failures += 1
+            print(f"[WARNING] Prediction snapshot refresh failed: {error}")
+            if previous is not None:
+                self._current = previous.mark_stale(error)
+        return error is None
+
+    def select(self, snapshot, filters):
+        """filters.select on the snapshot's predictions, memoized per snapshot version"""
+        key = filters.cache_key()
+        with self._pages_lock:
+            version, pages = self._pages
+            if version is None or snapshot.version > version:
+                version, pages = self._pages = (snapshot.version, OrderedDict())
+            selected = pages.get(key) if snapshot.version == version else None
+            if selected is not None:
+                pages.move_to_end(key)
+                return selected
+        selected = filters.select(snapshot.predictions)
+        with self._pages_lock:
+            version, pages = self._pages
+            if snapshot.version == version:
+                selected = pages.setdefault(key, selected)
+                while len(pages) > SNAPSHOT_PAGE_MEMO:
+                    pages.popitem(last=False)
+        return selected
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            self.refresh()
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+    def meta(self):
+        snapshot = self._current
+        meta = {
+            'enabled': self.enabled,
+            'interval_seconds': self.interval,
+            'consecutive_failures': self._failures,
+        }
+        if snapshot is not None:
+            meta.update({
+                'version': snapshot.version,
+                'generated_at': snapshot.generated_at,
+                'age_seconds': round(snapshot.age_seconds(), 1),
+                # Also stale if the refresh thread has fallen well behind
+                'stale': snapshot.stale or snapshot.age_seconds() > 2 * self.interval,
+                'last_error': snapshot.last_error,
+                'vehicle_count': len(snapshot.predictions),
+                'compute_ms': snapshot.compute_ms,
+            })
+        return meta
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Streaming Predictions (NDJSON)
+- /predict_all?stream=1 or Accept: application/x-ndjson: one JSON prediction per line
+- Vehicles are read from an unbuffered cursor in fetchmany batches and predicted
+  batch by batch, so per-request memory stays flat and the first lines go out
+  as soon as the first batch is computed
+- Optional gzip, compressed incrementally and flushed after every batch
+"""
+
+import json
+import os
+import zlib
+
+import fleet_engine
+from maintenance_schedule import REGISTRY as schedule_registry
+
+NDJSON = 'application/x-ndjson'
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 1000))
+STREAM_GZIP_LEVEL = int(os.getenv('STREAM_GZIP_LEVEL', 6))
+
+
+def wants_stream(args, accept):
+    return args.get('stream') in ('1', 'true') or NDJSON in (accept or '')
+
+
+def accepts_gzip(accept_encoding):
+    """True if the Accept-Encoding header allows gzip (q=0 refuses it)"""
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            q = params.strip()
+            try:
+                return not (q.startswith('q=') and float(q[2:]) == 0)
+            except ValueError:
+                return True
+    return False
+
+
+def encode_lines(predictions):
+    return ''.join(json.dumps(p, default=str) + '\n' for p in predictions).encode()
+
+
+def encode_batch(rows, filters=None, now=None):
+    """NDJSON bytes for one batch of vehicle rows (SQL filters already applied)"""
+    predictions = fleet_engine.predict_fleet(rows, schedule_registry, now)
+    if filters is not None and filters.active:
+        predictions, _ = filters.select(predictions, prefiltered=True)
+    return encode_lines(predictions)
+
+
+def chunked(predictions, size=STREAM_BATCH_SIZE):
+    """NDJSON bytes for predictions already in memory (snapshot, one page), batch by batch"""
+    for start in range(0, len(predictions), size):
+        yield encode_lines(predictions[start:start + size])
+
+
+def error_line(error):
+    return encode_lines([{'success': False, 'message': f'Error: {error}'}])
+
+
+class GzipStream:
+    """Incremental gzip: every chunk is flushed so the client can decode it right away"""
+
+    def __init__(self, level=None):
+        self._compressor = zlib.compressobj(STREAM_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def response_body(first, chunks, gzip=False):
+    """Response iterator: `first` (already produced) then the rest of `chunks`.
+
+    Errors after the headers went out are reported as a final error line.
+    Closing the iterator (client gone) closes `chunks`, releasing its DB connection.
+    """
+    encoder = GzipStream() if gzip else None
+    try:
+        for chunk in _chain(first, chunks):
+            if chunk:
+                yield encoder.compress(chunk) if encoder else chunk
+    except Exception as e:
+        print(f"[ERROR] Prediction stream failed: {e}")
+        yield encoder.compress(error_line(e)) if encoder else error_line(e)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+    if encoder:
+        yield encoder.finish()
+
+
+def _chain(first, chunks):
+    if first is not None:
+        yield first
+    yield from chunks
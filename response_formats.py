@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Response Formats
+- Content negotiation for /predict_all (?format=json|msgpack|arrow or the Accept header)
+- application/json (default): orjson when installed, else the json module
+- application/msgpack: columns + rows, so key names are sent once instead of per vehicle
+- application/vnd.apache.arrow.stream: columnar Arrow IPC stream (pyarrow)
+- msgpack and pyarrow are optional; asking for a format whose package is missing
+  gets 406 Not Acceptable
+- pyarrow is only imported by the first Arrow response (it is slow to import and
+  large in memory, and every worker imports this module)
+- In both compact formats `factors` is flattened into factors.<name> columns
+"""
+
+import importlib.util
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+PYARROW_INSTALLED = importlib.util.find_spec('pyarrow') is not None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+ARROW = 'application/vnd.apache.arrow.stream'
+
+MEDIA_TYPES = {'json': JSON, 'msgpack': MSGPACK, 'arrow': ARROW}
+
+# Accept header media types -> format
+ACCEPT_TYPES = {
+    JSON: 'json',
+    MSGPACK: 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+    ARROW: 'arrow',
+    'application/vnd.apache.arrow.file': 'arrow',
+}
+
+# Top-level key with nested per-vehicle values, flattened for the columnar formats
+NESTED = 'factors'
+
+
+def available(fmt):
+    if fmt == 'msgpack':
+        return msgpack is not None
+    if fmt == 'arrow':
+        return PYARROW_INSTALLED
+    return fmt == 'json'
+
+
+def negotiate(args, accept):
+    """Response format for a request, or None if nothing acceptable can be produced (406).
+
+    ?format= wins over the Accept header; without either the answer is JSON.
+    """
+    requested = args.get('format')
+    if requested:
+        requested = requested.strip().lower()
+        return requested if requested in MEDIA_TYPES and available(requested) else None
+    if not accept:
+        return 'json'
+
+    candidates = []
+    for position, part in enumerate(accept.split(',')):
+        media_type, _, params = part.partition(';')
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            candidates.append((-q, position, media_type))
+
+    for _, _, media_type in sorted(candidates):
+        if media_type in ('*/*', 'application/*'):
+            return 'json'
+        fmt = ACCEPT_TYPES.get(media_type)
+        if fmt is not None and available(fmt):
+            return fmt
+    return None
+
+
+def dumps_json(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str).encode()
+
+
+def columns(predictions):
+    """(names, column lists) of a list of prediction dicts, `factors` flattened"""
+    if not predictions:
+        return [], []
+    first = predictions[0]
+    keys = [key for key in first if key != NESTED]
+    names = list(keys)
+    values = [[prediction[key] for prediction in predictions] for key in keys]
+    if NESTED in first:
+        nested = [prediction[NESTED] for prediction in predictions]
+        for key in first[NESTED]:
+            names.append(f'{NESTED}.{key}')
+            values.append([factors[key] for factors in nested])
+    return names, values
+
+
+def rows(predictions):
+    """(names, rows): the same columns, row by row (tuples pack as msgpack arrays)"""
+    names, values = columns(predictions)
+    return names, list(zip(*values))
+
+
+def encode_msgpack(payload):
+    """{..., 'columns': [...], 'rows': [[...], ...]}: the envelope with `data` as rows"""
+    names, data = rows(payload['data'])
+    content = {key: value for key, value in payload.items() if key != 'data'}
+    content['columns'] = names
+    content['rows'] = data
+    return msgpack.packb(content, default=str)
+
+
+def encode_arrow(payload):
+    """Arrow IPC stream of `data`; the rest of the envelope goes into the schema metadata"""
+    import pyarrow
+    import pyarrow.ipc
+
+    names, values = columns(payload['data'])
+    table = pyarrow.table(dict(zip(names, values)))
+    meta = {key: value for key, value in payload.items() if key != 'data'}
+    table = table.replace_schema_metadata({'smart_track': dumps_json(meta)})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload, fmt):
+    """Response body for a {'success': ..., 'data': [...]} payload"""
+    if fmt == 'msgpack':
+        return encode_msgpack(payload)
+    if fmt == 'arrow':
+        return encode_arrow(payload)
+    return dumps_json(payload)
+
+
+def not_acceptable_message():
+    formats = [fmt for fmt in MEDIA_TYPES if available(fmt)]
+    return f"Requested response format is not available (available: {', '.join(formats)})"
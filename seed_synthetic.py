@@ -3,6 +3,8 @@ import mysql.connector
 from datetime import datetime, timedelta
 import os
 
+from maintenance_schedule import DEFAULT_SCHEDULE
+
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
     'user': os.getenv('DB_USER', 'root'),
@@ -12,28 +14,7 @@ DB_CONFIG = {
     'collation': 'utf8mb4_general_ci'
 }
 
-SCHEDULE = {
-    5000:  { 'tasks': ['oil_change'], 'months': 3 },
-    10000: { 'tasks': ['oil_change','tire_rotation'], 'months': 6 },
-    15000: { 'tasks': ['oil_change'], 'months': 9 },
-    20000: { 'tasks': ['oil_change','tire_rotation','wheel_alignment','brake_inspection'], 'months': 12 },
-    25000: { 'tasks': ['oil_change'], 'months': 15 },
-    30000: { 'tasks': ['oil_change','tire_rotation'], 'months': 18 },
-    35000: { 'tasks': ['oil_change'], 'months': 21 },
-    40000: { 'tasks': ['oil_change','tire_rotation','wheel_alignment','brake_inspection','ac_maintenance'], 'months': 24 },
-    45000: { 'tasks': ['oil_change','battery_check'], 'months': 27 },
-    50000: { 'tasks': ['oil_change','tire_rotation'], 'months': 30 },
-    55000: { 'tasks': ['oil_change'], 'months': 33 },
-    60000: { 'tasks': ['oil_change','tire_rotation','wheel_alignment','brake_inspection'], 'months': 36 },
-    65000: { 'tasks': ['oil_change'], 'months': 39 },
-    70000: { 'tasks': ['oil_change','tire_rotation'], 'months': 42 },
-    75000: { 'tasks': ['oil_change'], 'months': 45 },
-    80000: { 'tasks': ['oil_change','tire_rotation','wheel_alignment','brake_inspection','ac_maintenance'], 'months': 48 },
-    85000: { 'tasks': ['oil_change','battery_check'], 'months': 51 },
-    90000: { 'tasks': ['oil_change','tire_rotation'], 'months': 54 },
-    95000: { 'tasks': ['oil_change'], 'months': 57 },
-    100000:{ 'tasks': ['oil_change','tire_rotation','wheel_alignment','brake_inspection'], 'months': 60 }
-}
+SCHEDULE = DEFAULT_SCHEDULE.task_schedule()
 
 def ensure_vehicle(cur, name, unit, plate, current_mileage=0):
     cur.execute("SELECT id FROM fleet_vehicles WHERE plate_number=%s", (plate,))
@@ -93,7 +74,7 @@ def main():
     cur = conn.cursor()
     # Reset previous and recreate exactly 20 following milestones
     delete_synthetic(cur)
-    milestones = [5000,10000,15000,20000,25000,30000,35000,40000,45000,50000,55000,60000,65000,70000,75000,80000,85000,90000,95000,100000]
+    milestones = sorted(SCHEDULE)
     base_now = datetime.now()
     for idx, km in enumerate(milestones, start=1):
         plate = f"SYN-{1000+idx}"
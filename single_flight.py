@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Request Coalescing (single-flight)
+Concurrent callers asking for the same key wait on one in-flight computation
+and share its result (or its exception). Scope is one process / gunicorn worker.
+AsyncSingleFlight does the same for coroutines on one event loop (ASGI server).
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executions': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers of `key`.
+
+        The shared result must be treated as read-only by the callers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._stats['executions'] += 1
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutine functions; callers await a shared future"""
+
+    def __init__(self):
+        self._calls = {}
+        self._stats = {'executions': 0, 'coalesced': 0}
+
+    async def do(self, key, fn):
+        """Await fn() once for all concurrent callers of `key`.
+
+        The call runs as its own task, so a caller that goes away (cancelled
+        request) doesn't cancel it for the others.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._stats['executions'] += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Retrieve the exception so it isn't logged when every caller is gone
+            task.exception()
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['in_flight'] = len(self._calls)
+        return stats
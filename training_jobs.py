@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Background Training Jobs
+- POST /train submits a job and returns its id right away
+- Job records and the training lock live in a directory shared by all workers
+  (flock-guarded JSON file + a lock file held while a fit runs), so any worker
+  answers /train/<job_id> and a duplicate request joins the running job
+- Per-phase timings (fetch, feature_build, fit, evaluate, save) and result stats
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+PHASES = ('fetch', 'feature_build', 'fit', 'evaluate', 'save')
+
+
+ACTIVE_STATUSES = ('queued', 'running')
+JOBS_FILE = 'jobs.json'
+JOBS_LOCK = 'jobs.lock'
+TRAIN_LOCK = 'train.lock'
+
+
+class TrainingJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.current_phase = None
+        self.phases = OrderedDict()  # phase -> {'started_at', 'duration_ms'}
+        self.result = None
+        self.done = threading.Event()
+        self.on_change = None  # called after every state change (shared job record)
+        self._phase_start = None
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def start(self):
+        self.status = 'running'
+        self.started_at = datetime.now().isoformat()
+        self._changed()
+
+    def enter_phase(self, phase):
+        now = time.perf_counter()
+        self._close_phase(now)
+        self.current_phase = phase
+        self._phase_start = now
+        self.phases[phase] = {'started_at': datetime.now().isoformat(), 'duration_ms': None}
+        self._changed()
+
+    def _close_phase(self, now):
+        if self.current_phase is not None:
+            self.phases[self.current_phase]['duration_ms'] = round((now - self._phase_start) * 1000, 1)
+
+    def finish(self, result):
+        self._close_phase(time.perf_counter())
+        self.current_phase = None
+        self.result = result
+        self.status = 'succeeded' if result.get('success') else 'failed'
+        self.finished_at = datetime.now().isoformat()
+        self._changed()
+        self.done.set()
+
+    def to_dict(self):
+        completed = sum(1 for p in self.phases.values() if p['duration_ms'] is not None)
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'current_phase': self.current_phase,
+            'progress': round(100.0 * completed / len(PHASES)) if self.status != 'succeeded' else 100,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'phases': dict(self.phases),
+            'message': self.result.get('message') if self.result else None,
+            'training_stats': self.result.get('training_stats') if self.result else None,
+        }
+
+
+class TrainingJobManager:
+    def __init__(self, train_fn, state_dir, history=None, poll_interval=1.0):
+        """`train_fn(progress)` runs the training and returns the result dict.
+
+        `state_dir` must be shared by every worker (e.g. under MODEL_REGISTRY_DIR).
+        """
+        self.train_fn = train_fn
+        self.state_dir = state_dir
+        self.history = history or int(os.getenv('TRAINING_JOB_HISTORY', 20))
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._local = {}  # job id -> TrainingJob run by this process
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Executor threads don't survive a fork; create one per process
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='training')
+            self._pid = os.getpid()
+            self._local = {}
+        return self._executor
+
+    def _open(self, name):
+        os.makedirs(self.state_dir, exist_ok=True)
+        return open(os.path.join(self.state_dir, name), 'a+')
+
+    def _read(self):
+        try:
+            with open(os.path.join(self.state_dir, JOBS_FILE)) as f:
+                return OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            return OrderedDict()
+
+    def _write(self, jobs):
+        while len(jobs) > self.history:
+            jobs.popitem(last=False)
+        path = os.path.join(self.state_dir, JOBS_FILE)
+        tmp_path = f'{path}.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump(jobs, f)
+        os.replace(tmp_path, path)
+
+    def _locked_jobs(self):
+        """Open jobs lock file, held exclusively (close it to release)"""
+        lock = self._open(JOBS_LOCK)
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _acquire_training(self):
+        """Training lock file if no worker is training, else None"""
+        lock = self._open(TRAIN_LOCK)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        return lock
+
+    def _expire(self, jobs):
+        """Fail active records nobody is training (their worker exited); call with the jobs lock held"""
+        if not any(job['status'] in ACTIVE_STATUSES for job in jobs.values()):
+            return False
+        training = self._acquire_training()
+        if training is None:
+            return False
+        training.close()
+        for job in jobs.values():
+            if job['status'] in ACTIVE_STATUSES:
+                job.update(status='failed', current_phase=None, finished_at=datetime.now().isoformat(),
+                           message='Training worker exited before the job finished')
+        return True
+
+    def _save(self, job):
+        lock = self._locked_jobs()
+        try:
+            jobs = self._read()
+            jobs[job.id] = job.to_dict()
+            self._write(jobs)
+        finally:
+            lock.close()
+
+    def submit(self):
+        """Start a training job: (job record, created). A running job (on any worker) is returned instead."""
+        with self._lock:
+            executor = self._get_executor()
+            lock = self._locked_jobs()
+            try:
+                jobs = self._read()
+                if self._expire(jobs):
+                    self._write(jobs)
+                for record in reversed(jobs.values()):
+                    if record['status'] in ACTIVE_STATUSES:
+                        return record, False
+                training = self._acquire_training()
+                if training is None:
+                    raise RuntimeError('Training lock held without an active job record')
+                job = TrainingJob()
+                jobs[job.id] = job.to_dict()
+                self._write(jobs)
+            finally:
+                lock.close()
+            job.on_change = self._save
+            self._local[job.id] = job
+            executor.submit(self._run, job, training)
+            return job.to_dict(), True
+
+    def _run(self, job, training):
+        try:
+            job.start()
+            try:
+                result = self.train_fn(progress=job.enter_phase)
+            except Exception as e:
+                result = {'success': False, 'message': f'Training error: {str(e)}'}
+            job.finish(result)
+        finally:
+            training.close()
+            with self._lock:
+                self._local.pop(job.id, None)
+
+    def get(self, job_id):
+        """Job record from the shared state (any worker's job), None if unknown"""
+        lock = self._locked_jobs()
+        try:
+            jobs = self._read()
+            if self._expire(jobs):
+                self._write(jobs)
+            return jobs.get(job_id)
+        finally:
+            lock.close()
+
+    def wait(self, job_id, timeout=None):
+        """Job record once it has finished (None if unknown or still running after `timeout`)"""
+        with self._lock:
+            job = self._local.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            record = self.get(job_id)
+            if record is None or record['status'] not in ACTIVE_STATUSES:
+                return record
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+
+def job_result(record):
+    """Response body of a finished job (what ?wait=1 returns)"""
+    result = {'success': record['status'] == 'succeeded', 'message': record['message'], 'job_id': record['job_id']}
+    if record.get('training_stats') is not None:
+        result['training_stats'] = record['training_stats']
+    return result
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Smart Track - NumPy Tree Ensemble
+- Exports a trained XGBoost booster to flat arrays (split feature, threshold,
+  children, default direction, leaf value) saved as trees.npz
+- Vectorized pure-NumPy evaluator with the same predictions, so inference
+  workers start without importing xgboost or scikit-learn
+- CLI exports trees.npz for registry versions published before the exporter
+  existed and checks parity against xgboost
+
+Usage:
+  python tree_ensemble.py                  # export + verify the current version
+  python tree_ensemble.py --all            # every version in the registry
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+# Objectives whose prediction is the raw margin (no link function)
+IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror')
+
+
+class TreeEnsemble:
+    """All trees of a booster in one set of node arrays (global node ids)"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 depth, base_score, objective='reg:squarederror'):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.depth = int(depth)
+        self.base_score = float(base_score)
+        self.objective = str(objective)
+
+    @property
+    def num_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Flatten an xgboost Booster (or XGBRegressor) into node arrays"""
+        if hasattr(booster, 'get_booster'):
+            booster = booster.get_booster()
+        learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+
+        objective = learner['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f'Unsupported objective for NumPy export: {objective}')
+        params = learner['learner_model_param']
+        if int(params.get('num_target', 1)) != 1 or int(params.get('num_class', 0)) > 1:
+            raise ValueError('Only single-output regression models can be exported')
+        gbm = learner['gradient_booster']
+        if gbm['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster for NumPy export: {gbm['name']}")
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        depth = 0
+        offset = 0
+        for tree in gbm['model']['trees']:
+            if any(tree['split_type']):
+                raise ValueError('Categorical splits are not supported by the NumPy evaluator')
+            lc = np.asarray(tree['left_children'], dtype=np.int64)
+            rc = np.asarray(tree['right_children'], dtype=np.int64)
+            is_leaf = lc == -1
+            nodes = np.arange(len(lc))
+            roots.append(offset)
+            # Leaves point at themselves so extra traversal steps are no-ops;
+            # leaf values live in split_conditions
+            feature.append(np.where(is_leaf, 0, tree['split_indices']))
+            threshold.append(np.where(is_leaf, 0.0, tree['split_conditions']))
+            value.append(np.where(is_leaf, tree['split_conditions'], 0.0))
+            left.append(np.where(is_leaf, nodes, lc) + offset)
+            right.append(np.where(is_leaf, nodes, rc) + offset)
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            depth = max(depth, _tree_depth(lc, rc))
+            offset += len(lc)
+
+        # base_score is '1.87E0' (or '[1.87E0]' in newer xgboost)
+        base_score = float(params['base_score'].strip('[]'))
+        return cls(np.concatenate(feature), np.concatenate(threshold), np.concatenate(left),
+                   np.concatenate(right), np.concatenate(default_left), np.concatenate(value),
+                   roots, depth, base_score, objective)
+
+    def save(self, path):
+        # np.savez appends .npz to bare names; write through a file object to keep `path`
+        with open(path, 'wb') as f:
+            np.savez(f, feature=self.feature, threshold=self.threshold, left=self.left,
+                     right=self.right, default_left=self.default_left, value=self.value,
+                     roots=self.roots, depth=self.depth, base_score=self.base_score,
+                     objective=self.objective)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+                       arrays['default_left'], arrays['value'], arrays['roots'],
+                       arrays['depth'], arrays['base_score'], arrays['objective'])
+
+    def predict(self, X, chunk_size=1000):
+        """Predictions for a 2-D feature matrix, bit-for-bit equal to xgboost.
+
+        Every row walks every tree at once: one gather/compare per tree level,
+        `depth` steps in total. Features are compared as float32 and leaf
+        values summed in tree order in float32, as xgboost does. Small chunks
+        keep the (trees x rows) node arrays in cache.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError('Expected a 2-D feature matrix')
+        children = np.stack([self.left, self.right], axis=1).ravel()
+        feature = self.feature.astype(np.intp)
+        roots = self.roots.astype(np.intp)
+        predictions = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size]
+            n = len(chunk)
+            # Feature-major copy: value of feature f for row r at f * n + r
+            columns = np.ascontiguousarray(chunk.T).ravel()
+            rows = np.arange(n, dtype=np.intp)
+            node = np.repeat(roots, n).reshape(-1, n)  # (trees, rows)
+            has_nan = bool(np.isnan(chunk).any())
+            for _ in range(self.depth):
+                fvalue = columns[feature[node] * n + rows]
+                go_right = fvalue >= self.threshold[node]
+                if has_nan:
+                    missing = np.isnan(fvalue)
+                    go_right[missing] = ~self.default_left[node[missing]]
+                node = children[2 * node + go_right]
+            leaves = self.value[node]
+            margin = np.full(n, self.base_score, dtype=np.float32)
+            for tree_values in leaves:
+                margin += tree_values
+            predictions[start:start + n] = margin
+        return predictions
+
+
+def _tree_depth(left_children, right_children):
+    """Number of splits on the longest root-to-leaf path"""
+    depth = 0
+    level = [0]
+    while True:
+        level = [child for node in level for child in (left_children[node], right_children[node]) if child != -1]
+        if not level:
+            return depth
+        depth += 1
+
+
+def main():
+    from model_registry import ModelRegistry, TREES_FILE
+
+    parser = argparse.ArgumentParser(description='Export registry models to NumPy tree arrays')
+    parser.add_argument('--registry', default=None, help='Registry directory (default: MODEL_REGISTRY_DIR)')
+    parser.add_argument('--all', action='store_true', help='Export every version, not just the current one')
+    parser.add_argument('--rows', type=int, default=10000, help='Random rows used for the parity check')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(root=args.registry)
+    versions = registry.versions() if args.all else [registry.current_version()]
+    versions = [v for v in versions if v]
+    if not versions:
+        raise SystemExit(f'[ERROR] No model versions in {registry.root}')
+
+    rng = np.random.default_rng(42)
+    for version in versions:
+        model, scaler, _ = registry.load(version)
+        ensemble = TreeEnsemble.from_booster(model)
+        ensemble.save(os.path.join(registry.version_dir(version), TREES_FILE))
+
+        X = rng.normal(size=(args.rows, len(scaler.mean_)))
+        expected = model.get_booster().inplace_predict(X)
+        diff = float(np.max(np.abs(ensemble.predict(X) - expected)))
+        print(f"[SUCCESS] {version}: {ensemble.num_trees} trees, depth {ensemble.depth}, "
+              f"max abs diff vs xgboost {diff:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Smart Track - Urgency Transition Events (Server-Sent Events)
+- One background thread per worker polls the fleet predictions (prediction
+  cache or snapshot, so nothing is recomputed unless the data changed) while
+  someone is subscribed
+- Only vehicles whose prediction digest changed (change_tracking) are compared
+  with their previous urgency level; a different level becomes an event
+- Each event is encoded once and queued for every subscriber that wants it
+- Recent events are kept so a reconnecting client (Last-Event-ID) gets what it
+  missed; a subscriber too slow to drain its queue is disconnected and
+  reconnects the same way
+- Subscribers per worker are capped (EVENTS_MAX_SUBSCRIBERS): each Flask stream
+  holds a gthread thread, so without a cap open dashboards starve every route
+- Event ids are "<epoch>-<sequence>" with a random epoch per process, so an id
+  from another worker or an earlier process is recognised as unknown and answered
+  with a reset event (refetch the fleet) instead of being compared numerically
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+
+from response_formats import dumps_json
+
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 5))
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', 15))
+EVENTS_BUFFER = int(os.getenv('EVENTS_BUFFER', 1000))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 1000))
+# Open streams per worker (0: no limit); the default leaves 2 of the 4 gthread threads for other routes
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 2))
+# Seconds a client turned away at the cap is asked to wait (Retry-After)
+EVENTS_RETRY_AFTER = int(os.getenv('EVENTS_RETRY_AFTER', 30))
+
+# Sent first on every stream: reconnect delay for EventSource clients (ms)
+STREAM_PREAMBLE = b'retry: 5000\n\n'
+HEARTBEAT = b': keepalive\n\n'
+
+
+def encode_event(event_id, event, name=b'urgency'):
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (event_id.encode(), name, dumps_json(event))
+
+
+def parse_event_id(value):
+    """(epoch, sequence) of a Last-Event-ID, None if it isn't one of ours"""
+    epoch, _, sequence = (value or '').rpartition('-')
+    try:
+        return epoch, int(sequence)
+    except ValueError:
+        return None
+
+
+class TooManySubscribers(Exception):
+    """The worker already serves its maximum number of streams (reported as 503)"""
+
+
+class Subscription:
+    """Queue of encoded events for one client of a thread-per-request server"""
+
+    def __init__(self, levels=None, maxsize=None):
+        self.levels = levels
+        self.overflowed = False
+        self.queue = queue.Queue(maxsize or EVENTS_QUEUE_SIZE)
+
+    def wants(self, event):
+        return self.levels is None or event['new_urgency'] in self.levels
+
+    def put(self, chunk):
+        try:
+            self.queue.put_nowait(chunk)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next encoded event, or None after `timeout` seconds without one"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """Subscription consumed from an event loop (the poller thread hands events over to the loop)"""
+
+    def __init__(self, loop, levels=None, maxsize=None):
+        self.levels = levels
+        self.overflowed = False
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize or EVENTS_QUEUE_SIZE)
+
+    def put(self, chunk):
+        self.loop.call_soon_threadsafe(self._put, chunk)
+
+    def _put(self, chunk):
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class UrgencyEvents:
+    def __init__(self, source, generation, interval=None, max_subscribers=None):
+        """`source()` returns the current prediction list (or None if unavailable),
+        `generation(predictions)` its change_tracking generation."""
+        self.source = source
+        self.generation = generation
+        self.interval = interval if interval is not None else EVENTS_POLL_INTERVAL
+        self.max_subscribers = max_subscribers if max_subscribers is not None else EVENTS_MAX_SUBSCRIBERS
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._subscribers = set()
+        self._recent = deque(maxlen=EVENTS_BUFFER)  # (sequence, event, encoded)
+        self._new_epoch()
+        self._generation = None
+        self._levels = {}  # vehicle_id -> urgency level of the last generation
+        self._thread = None
+        self._pid = None
+        self._polls = 0
+        self._failures = 0
+
+    def _new_epoch(self):
+        self._epoch = uuid.uuid4().hex[:12]
+        self._next_id = 1
+        self._recent.clear()
+
+    def _event_id(self, sequence):
+        return f'{self._epoch}-{sequence}'
+
+    def ensure_started(self):
+        """Start the poller thread (again after a fork: threads don't survive it)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked worker: ids must not collide with the parent's or a sibling's
+                self._new_epoch()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='urgency-events', daemon=True)
+            self._thread.start()
+
+    def subscribe(self, subscription, last_event_id=None):
+        """Register a subscription; events after `last_event_id` still in the buffer are queued first.
+
+        An id from another process, or older than the buffer, can't be replayed:
+        the subscription gets a reset event instead. Raises TooManySubscribers
+        at the max_subscribers cap.
+        """
+        self.ensure_started()
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f'Too many event streams on this worker ({self.max_subscribers})')
+            if last_event_id:
+                replay = self._replay_from(parse_event_id(last_event_id))
+                if replay is None:
+                    subscription.put(encode_event(self._event_id(self._next_id - 1),
+                                                  {'reason': 'unknown_event_id'}, b'reset'))
+                else:
+                    for sequence, event, encoded in self._recent:
+                        if sequence > replay and subscription.wants(event):
+                            subscription.put(encoded)
+            self._subscribers.add(subscription)
+            self._wakeup.notify()
+        return subscription
+
+    def _replay_from(self, parsed):
+        """Sequence to replay after, None if the id is unknown or its successors were dropped"""
+        if parsed is None or parsed[0] != self._epoch:
+            return None
+        sequence = parsed[1]
+        oldest = self._recent[0][0] if self._recent else self._next_id
+        if not oldest - 1 <= sequence < self._next_id:
+            return None
+        return sequence
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def poll(self):
+        """Diff the current predictions against the previous generation and publish the transitions"""
+        predictions = self.source()
+        if predictions is None:
+            return []
+        generation = self.generation(predictions)
+        previous = self._generation
+        if previous is not None and generation.token == previous.token:
+            return []
+
+        if previous is None:
+            # First look at the fleet: the baseline, nothing to report yet
+            self._levels = {p['vehicle_id']: p['urgency_level'] for p in predictions}
+            self._generation = generation
+            return []
+
+        changed, removed = generation.changed_since(previous)
+        now = datetime.now().isoformat()
+        events = []
+        for position in changed.tolist():
+            prediction = predictions[position]
+            vehicle_id = prediction['vehicle_id']
+            old = self._levels.get(vehicle_id)
+            new = prediction['urgency_level']
+            self._levels[vehicle_id] = new
+            if old != new:
+                events.append({
+                    'vehicle_id': vehicle_id,
+                    'plate_number': prediction.get('plate_number'),
+                    'old_urgency': old,
+                    'new_urgency': new,
+                    'next_maintenance_date': prediction.get('next_maintenance_date'),
+                    'days_until_maintenance': prediction.get('days_until_maintenance'),
+                    'detected_at': now,
+                })
+        for vehicle_id in removed.tolist():
+            self._levels.pop(vehicle_id, None)
+        self._generation = generation
+        self.publish(events)
+        return events
+
+    def publish(self, events):
+        with self._lock:
+            for event in events:
+                sequence = self._next_id
+                self._next_id += 1
+                encoded = encode_event(self._event_id(sequence), event)
+                self._recent.append((sequence, event, encoded))
+                for subscription in self._subscribers:
+                    if subscription.wants(event):
+                        subscription.put(encoded)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Idle (no polling, no fleet computations) until someone subscribes
+                while not self._subscribers:
+                    self._wakeup.wait()
+            try:
+                self.poll()
+                self._polls += 1
+                self._failures = 0
+            except Exception as e:
+                self._failures += 1
+                print(f"[WARNING] Urgency event poll failed: {e}")
+            with self._lock:
+                self._wakeup.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'last_event_id': self._event_id(self._next_id - 1),
+                'buffered_events': len(self._recent),
+                'tracked_vehicles': len(self._levels),
+                'polls': self._polls,
+                'consecutive_failures': self._failures,
+                'poll_interval_seconds': self.interval,
+            }